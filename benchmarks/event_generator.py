@@ -0,0 +1,58 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+"""
+Sends Cyolo change events to the connector's event receiver, as the console's webhooks would.
+
+    python benchmarks/event_generator.py --url http://127.0.0.1:8950 --secret <secret> --entity user --action deleted --id <id>
+    python benchmarks/event_generator.py --url http://127.0.0.1:8950 --secret <secret> --entity user --count 1000
+"""
+
+import argparse
+import json
+import urllib.request
+import uuid
+
+SECRET_HEADER = 'X-Cyolo-Webhook-Secret'
+
+
+def make_event(entity, action, record):
+    return {'event': f"{entity}.{action}", 'id': record['id'], 'data': record}
+
+
+def send_events(url, events, secret=None):
+    request = urllib.request.Request(url, data=json.dumps(events).encode(), method='POST',
+                                     headers={'Content-Type': 'application/json'})
+    if secret:
+        request.add_header(SECRET_HEADER, secret)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send Cyolo change events to the connector event receiver.')
+    parser.add_argument('--url', required=True)
+    parser.add_argument('--secret')
+    parser.add_argument('--entity', default='user')
+    parser.add_argument('--action', default='updated', choices=['created', 'updated', 'deleted'])
+    parser.add_argument('--id', help='ID of the changed record, generated when omitted')
+    parser.add_argument('--name', help='Name of the changed record, generated when omitted')
+    parser.add_argument('--count', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+    events = []
+    for i in range(args.count):
+        record_id = args.id or str(uuid.uuid4())
+        events.append(make_event(args.entity, args.action, {'id': record_id,
+                                                            'name': args.name or f"{args.entity}-{record_id[:8]}"}))
+    applied = 0
+    for start in range(0, len(events), args.batch_size):
+        applied += len(send_events(args.url, events[start:start + args.batch_size], args.secret)['applied'])
+    print(f"Applied {applied} events")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+"""
+Benchmarks every action in cyolo.operations against a local Cyolo stand-in server.
+
+The stand-in runs in a separate process so that its memory does not count towards the connector's.
+The connector imports the FortiSOAR connector SDK, so run this where the SDK is available:
+
+    python benchmarks/run_benchmarks.py --users 10000 --policies 5000 --latency-ms 5 --iterations 20
+    python benchmarks/run_benchmarks.py --output current.json --baseline previous.json --threshold 20
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_server import start_server  # noqa: E402
+
+
+def serve(args, queue):
+    server, tenant = start_server(args.users, args.policies, args.users_per_policy, args.latency_ms)
+    queue.put({
+        'port': server.server_address[1],
+        'users': [x['id'] for x in tenant.collections['users']],
+        'user_names': [x['name'] for x in tenant.collections['users']],
+        'policies': [x['id'] for x in tenant.collections['policies']],
+        'mappings': [x['id'] for x in tenant.collections['mappings']]
+    })
+    while True:
+        time.sleep(3600)
+
+
+def build_params(tenant, snapshot_path):
+    users, policies = tenant['users'], tenant['policies']
+    # Imports replay whatever the export action wrote, which runs first; both only use the temporary directory.
+    export_path = f"benchmark_policies_{os.getpid()}.jsonl.gz"
+    # Users at the end of the list are reserved for the destructive actions.
+    deletable = iter(users[-len(users) // 10:])
+    return {
+        'list_user_policies': lambda i: {'id': users[i % len(users)]},
+        'get_user_by_id_or_name': lambda i: {'id': users[i % len(users)]},
+        'delete_user_by_id_or_name': lambda i: {'id': next(deletable)},
+        'offboard_users': lambda i: {'users': [next(deletable), next(deletable)]},
+        'get_policy_by_id_or_name': lambda i: {'id': policies[i % len(policies)]},
+        'create_policy': lambda i: {'name': f"benchmark-{i}", 'users': ','.join(users[i:i + 5]),
+                                    'supervisors': tenant['user_names'][i]},
+        'update_policy': lambda i: {'id': policies[i % len(policies)], 'users': users[i % len(users)]},
+        'delete_user_from_policy': lambda i: {'id': policies[i % len(policies)], 'users': users[i % len(users)]},
+        'add_members_to_policies': lambda i: {'policy_ids': policies[i * 10:i * 10 + 10], 'users': users[i]},
+        'remove_members_from_policies': lambda i: {'policy_ids': policies[i * 10:i * 10 + 10], 'users': users[i]},
+        'sync_entities': lambda i: {'entity': 'users', 'snapshot_path': snapshot_path},
+        'get_effective_access': lambda i: {'user': users[i % len(users)]},
+        'who_can_access': lambda i: {'mapping': tenant['mappings'][i % len(tenant['mappings'])]},
+        # A second API key gives the same stub console a separate configuration to fan out to.
+        'query_all_consoles': lambda i: {'query': 'Get User By ID or Name', 'query_params': {'id': users[i % len(users)]},
+                                         'configurations': [{'name': 'replica', 'api_key': 'benchmark-replica',
+                                                             'server_url': f"http://127.0.0.1:{tenant['port']}"}]},
+        'get_active_policies': lambda i: {'time': f"2024-01-{1 + i % 28:02d}T{i % 24:02d}:30:00Z"},
+        'export_policies': lambda i: {'file_path': export_path},
+        'import_policies': lambda i: {'file_path': export_path},
+    }
+
+
+def reset_caches(operations_module, config):
+    operations_module.invalidate_catalog_cache(config)
+    operations_module.invalidate_name_index(config)
+    operations_module.invalidate_access_graph(config)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run_operation(name, action, config, make_params, iterations):
+    samples, errors = [], []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        try:
+            action(config, make_params(i))
+        except Exception as err:
+            errors.append(str(err))
+        samples.append((time.perf_counter() - call_start) * 1000)
+    total = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        action(config, make_params(iterations))
+    except Exception as err:
+        errors.append(str(err))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'iterations': iterations,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(percentile(samples, 0.5), 3),
+        'p95_ms': round(percentile(samples, 0.95), 3),
+        'max_ms': round(max(samples), 3),
+        'ops_per_second': round(iterations / total, 2) if total else None,
+        'peak_memory_kb': round(peak / 1024, 1)
+    }
+
+
+def compare(results, baseline, threshold, min_delta):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'peak_memory_kb'):
+            # Sub-millisecond timings are mostly noise, so small absolute changes are ignored.
+            if result[metric] - previous[metric] > min_delta and result[metric] > previous[metric] * (1 + threshold / 100):
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {result[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Cyolo connector actions.')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--policies', type=int, default=5000)
+    parser.add_argument('--users-per-policy', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=2)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--operations', help='Comma-separated actions to run, by default all of them')
+    parser.add_argument('--rate-limit', type=int, default=0, help='Rate Limit configured on the connector')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=20, help='Allowed regression against the baseline, in percent')
+    parser.add_argument('--min-delta', type=float, default=1,
+                        help='Smallest absolute increase, in ms or KB, reported as a regression')
+    args = parser.parse_args()
+
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(args, queue), daemon=True)
+    server.start()
+    tenant = queue.get(timeout=600)
+
+    from cyolo import operations as operations_module
+    config = {'server_url': f"http://127.0.0.1:{tenant['port']}", 'api_key': 'benchmark', 'verify_ssl': False,
+              'rate_limit': args.rate_limit}
+    selected = args.operations.split(',') if args.operations else list(operations_module.operations)
+    snapshot_path = f"benchmark_sync_{os.getpid()}.db"
+    params = build_params(tenant, snapshot_path)
+    results = {}
+    print(f"{'operation':<32}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'ops/s':>10}{'peak KB':>12}{'errors':>8}")
+    for name in selected:
+        reset_caches(operations_module, config)
+        result = run_operation(name, operations_module.operations[name], config, params.get(name, lambda i: {}),
+                               args.iterations)
+        results[name] = result
+        print(f"{name:<32}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['max_ms']:>10}"
+              f"{result['ops_per_second']:>10}{result['peak_memory_kb']:>12}{result['errors']:>8}")
+        if result['first_error']:
+            print(f"    first error: {result['first_error']}")
+    server.terminate()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_delta)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
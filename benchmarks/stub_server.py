@@ -0,0 +1,233 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+"""
+Local stand-in for the Cyolo /v1/ API, serving a synthetic tenant for benchmarking the connector.
+
+    python benchmarks/stub_server.py --users 10000 --policies 5000 --latency-ms 5 --port 8443
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+POLICY_ATTR = ['users', 'mappings', 'dynamic_groups', 'simple_groups', 'group_supervisors', 'supervisors', 'webhooks',
+               'mapping_categories']
+
+POLICY_ENTITY = {
+    'users': 'users', 'supervisors': 'users', 'mappings': 'mappings', 'simple_groups': 'simple_group',
+    'dynamic_groups': 'dynamic_group', 'group_supervisors': 'simple_group', 'webhooks': 'webhooks',
+    'mapping_categories': 'mapping_category'
+}
+
+
+def make_entity(kind, index, **extra):
+    entity = {
+        'id': str(uuid.UUID(int=random.getrandbits(128))),
+        'kind': kind,
+        'name': f"{kind}-{index}",
+        'system': False,
+        'ctime': '2023-01-01T00:00:00Z',
+        'mtime': '2023-01-01T00:00:00Z',
+        'enabled': True
+    }
+    entity.update(extra)
+    return entity
+
+
+class Tenant:
+    def __init__(self, users=1000, policies=500, users_per_policy=20, seed=0):
+        random.seed(seed)
+        self.lock = threading.Lock()
+        self.collections = {
+            'users': [make_entity('user', i, email=f"user-{i}@example.com", phone_number='', totp_enabled=False,
+                                  supervisor=False, labels=[]) for i in range(users)],
+            'mappings': [make_entity('mapping', i, domain=f"app-{i}.example.com", port=443, protocol='https')
+                         for i in range(max(users // 20, 10))],
+            'simple_group': [make_entity('simple_group', i) for i in range(max(users // 50, 5))],
+            'dynamic_group': [make_entity('dynamic_group', i) for i in range(max(users // 100, 5))],
+            'webhooks': [make_entity('webhook', i, url=f"https://hooks.example.com/{i}") for i in range(10)],
+            'mapping_category': [make_entity('mapping_category', i) for i in range(20)],
+            'certificates': [make_entity('certificate', i) for i in range(10)],
+            'device_posture_profiles': [make_entity('device_posture_profile', i) for i in range(10)],
+            'capabilities': [make_entity('capability', i) for i in range(30)],
+            'constraints': [make_entity('constraint', i) for i in range(15)],
+            'policies': []
+        }
+        self.by_id = {name: {x['id']: x for x in records} for name, records in self.collections.items()}
+        for i in range(policies):
+            policy = make_entity('policy', i, capabilities=[], constraints=[], ip_sources=[],
+                                 trusted_certificates=[], device_posture_profile_ids=[],
+                                 timed_access={'enabled': False, 'start': '00:00', 'end': '00:00', 'days': [False] * 7})
+            sizes = {'users': users_per_policy, 'mappings': 3, 'simple_groups': 1, 'dynamic_groups': 1,
+                     'supervisors': 1, 'group_supervisors': 0, 'webhooks': 0, 'mapping_categories': 1}
+            for attr in POLICY_ATTR:
+                pool = self.collections[POLICY_ENTITY[attr]]
+                policy[attr] = [self.reference(x) for x in random.sample(pool, min(sizes[attr], len(pool)))]
+            self.add('policies', policy)
+        self.encoded = {}
+
+    @staticmethod
+    def reference(entity):
+        return {'id': entity['id'], 'kind': entity['kind'], 'name': entity['name']}
+
+    def add(self, collection, record):
+        self.collections[collection].append(record)
+        self.by_id[collection][record['id']] = record
+
+    def list(self, collection, limit=None, offset=0):
+        with self.lock:
+            records = self.collections[collection]
+            if limit is None:
+                if collection not in self.encoded:
+                    self.encoded[collection] = json.dumps(records).encode()
+                return self.encoded[collection]
+            return json.dumps(records[offset:offset + limit]).encode()
+
+    def user_policies(self, user_id):
+        with self.lock:
+            return [x for x in self.collections['policies'] if any(u['id'] == user_id for u in x['users'])]
+
+    def save_policy(self, policy_id, payload):
+        with self.lock:
+            policy = self.by_id['policies'].get(policy_id)
+            if policy_id and not policy:
+                return None
+            if not policy:
+                policy = make_entity('policy', len(self.collections['policies']))
+                self.add('policies', policy)
+            for key, value in payload.items():
+                if key in POLICY_ENTITY:
+                    lookup = self.by_id[POLICY_ENTITY[key]]
+                    policy[key] = [self.reference(lookup[x]) if x in lookup else {'id': x} for x in value]
+                elif key == 'device_posture_profiles':
+                    policy['device_posture_profile_ids'] = value
+                else:
+                    policy[key] = value
+            policy['mtime'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            self.encoded.pop('policies', None)
+            return policy
+
+    def delete_user(self, user_id):
+        with self.lock:
+            user = self.by_id['users'].pop(user_id, None)
+            if user:
+                self.collections['users'].remove(user)
+                self.encoded.pop('users', None)
+            return user
+
+
+def make_handler(tenant, latency):
+    class CyoloHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def send_body(self, body, status=200):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def route(self):
+            time.sleep(latency)
+            if not self.headers.get('Authorization'):
+                self.send_body({'error': 'unauthorized'}, 401)
+                return None
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')[1:]
+            return parts, {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        def read_payload(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            routed = self.route()
+            if not routed:
+                return
+            parts, query = routed
+            collection = parts[0] if parts else ''
+            if collection not in tenant.collections:
+                self.send_body({'error': 'not found'}, 404)
+            elif len(parts) == 1:
+                limit = int(query['limit']) if 'limit' in query else None
+                self.send_body(tenant.list(collection, limit, int(query.get('offset', 0))))
+            elif len(parts) == 3 and collection == 'users' and parts[2] == 'policies':
+                self.send_body(tenant.user_policies(parts[1]))
+            elif parts[1] in tenant.by_id[collection]:
+                self.send_body(tenant.by_id[collection][parts[1]])
+            else:
+                self.send_body({'error': 'not found'}, 404)
+
+        def do_POST(self):
+            routed = self.route()
+            if not routed:
+                return
+            parts, query = routed
+            policy = tenant.save_policy(parts[1], self.read_payload()) if parts[:1] == ['policies'] and len(parts) == 2 else None
+            self.send_body(policy if policy else {'error': 'not found'}, 200 if policy else 404)
+
+        def do_PUT(self):
+            routed = self.route()
+            if not routed:
+                return
+            parts, query = routed
+            if parts != ['policies']:
+                self.send_body({'error': 'not found'}, 404)
+                return
+            self.send_body(tenant.save_policy(None, self.read_payload()))
+
+        def do_DELETE(self):
+            routed = self.route()
+            if not routed:
+                return
+            parts, query = routed
+            user = tenant.delete_user(parts[1]) if parts[:1] == ['users'] and len(parts) == 2 else None
+            self.send_body({'status': 'deleted'} if user else {'error': 'not found'}, 200 if user else 404)
+
+    return CyoloHandler
+
+
+def start_server(users=1000, policies=500, users_per_policy=20, latency_ms=0, port=0, seed=0):
+    tenant = Tenant(users, policies, users_per_policy, seed)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(tenant, latency_ms / 1000))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, tenant
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic Cyolo tenant over HTTP.')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--policies', type=int, default=5000)
+    parser.add_argument('--users-per-policy', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    server, tenant = start_server(args.users, args.policies, args.users_per_policy, args.latency_ms, args.port,
+                                  args.seed)
+    print(f"Serving {args.users} users and {args.policies} policies on http://127.0.0.1:{server.server_address[1]}",
+          flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
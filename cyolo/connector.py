@@ -4,27 +4,46 @@
   FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
   Copyright end """
 
+import time
 from connectors.core.connector import Connector, get_logger, ConnectorError
-from .operations import operations, _check_health
+from .operations import operations, _check_health, record_operation_metrics, ensure_event_receiver, stop_event_receiver
+from .constants import ENV_OPERATIONS
 logger = get_logger('cyolo')
 
 
 class Cyolo(Connector):
     def execute(self, config, operation, params, **kwargs):
+        start = time.perf_counter()
+        failed = False
         try:
-            operation = operations.get(operation)
-            if not operation:
+            ensure_event_receiver(config)
+            action = operations.get(operation)
+            if not action:
                 logger.error('Unsupported operation: {}'.format(operation))
                 raise ConnectorError('Unsupported operation')
-            return operation(config, params)
+            if operation in ENV_OPERATIONS:
+                return action(config, params, env=kwargs.get('env', {}))
+            return action(config, params)
         except Exception as err:
+            failed = True
             logger.exception(err)
             raise ConnectorError(err)
+        finally:
+            if operation in operations:
+                record_operation_metrics(operation, time.perf_counter() - start, failed)
 
     def check_health(self, config=None):
         try:
+            ensure_event_receiver(config)
             return _check_health(config)
         except Exception as err:
             raise ConnectorError(err)
 
+    def on_update_config(self, old_config, new_config, active):
+        stop_event_receiver(old_config)
+        ensure_event_receiver(new_config)
+
+    def on_delete_config(self, config):
+        stop_event_receiver(config)
+
 
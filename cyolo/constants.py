@@ -7,3 +7,203 @@ POLICY_ATTR = ['users', 'mappings', 'dynamic_groups', 'simple_groups', 'group_su
 
 PAYLOAD_PARAMS = ["name", "enabled", "mappings",  "users", "capabilities", "constraints", "supervisors",
                   "webhooks", "simple_groups", "dynamic_groups", "mapping_categories", "group_supervisors", "ip_sources", "trusted_certificates"]
+
+DEFAULT_POOL_SIZE = 10
+
+DEFAULT_SESSION_IDLE_TIMEOUT = 300
+
+MEMBERSHIP_PARAMS = ['users', 'simple_groups', 'dynamic_groups']
+
+OFFBOARDING_POLICY_ATTR = ['users', 'supervisors']
+
+BULK_MAX_WORKERS = 8
+
+BULK_MAX_WORKERS_LIMIT = 32
+
+DEFAULT_PAGE_SIZE = 100
+
+MAX_PAGE_SIZE = 1000
+
+CATALOG_CACHE_TTL = {
+    'capabilities': 3600,
+    'constraints': 3600,
+    'mapping_category': 900,
+    'device_posture_profiles': 900,
+    'certificates': 300
+}
+
+DEFAULT_CATALOG_CACHE_TTL = 300
+
+CATALOG_CACHE_MAX_ENTRIES = 128
+
+RESOLVER_ENDPOINTS = {
+    'mappings': 'mappings',
+    'supervisors': 'users',
+    'users': 'users',
+    'simple_groups': 'simple_group',
+    'dynamic_groups': 'dynamic_group',
+    'webhooks': 'webhooks',
+    'mapping_categories': 'mapping_category',
+    'trusted_certificates': 'certificates',
+    'device_posture_profiles': 'device_posture_profiles'
+}
+
+RESOLVER_NAME_FIELDS = ['name', 'email']
+
+RESOLVER_INDEX_TTL = 300
+
+RESOLVER_REFRESH_INTERVAL = 30
+
+INVENTORY_ENTITIES = ['users', 'policies', 'simple_groups', 'dynamic_groups', 'mappings', 'mapping_categories',
+                      'webhooks', 'certificates', 'capabilities', 'constraints', 'device_posture_profiles']
+
+SYNC_STORE_FILE = 'cyolo_sync.db'
+
+SYNC_STORE_SUFFIX = '.db'
+
+DEFAULT_RATE_LIMIT = 20
+
+DEFAULT_MAX_RETRIES = 3
+
+RETRY_STATUS_CODES = [500, 502, 503, 504]
+
+RETRY_METHODS = ['GET', 'POST', 'DELETE']
+
+RETRY_BACKOFF_BASE = 1
+
+RETRY_MAX_DELAY = 60
+
+DEFAULT_CONNECT_TIMEOUT = 10
+
+DEFAULT_READ_TIMEOUT = 60
+
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5
+
+DEFAULT_CIRCUIT_RESET_TIMEOUT = 30
+
+CIRCUIT_CLOSED = 'Closed'
+
+CIRCUIT_OPEN = 'Open'
+
+CIRCUIT_HALF_OPEN = 'Half-Open'
+
+METRICS_LATENCY_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+HEALTH_CHECK_ENDPOINT = 'capabilities'
+
+DEFAULT_HEALTH_CHECK_TTL = 60
+
+DEFAULT_POLICY_WRITE_WINDOW = 50
+
+POLICY_WRITE_RETRIES = 3
+
+INGESTION_FIELD_MAP = {
+    'users': {
+        'sourceId': 'id', 'name': 'name', 'email': 'email', 'phoneNumber': 'phone_number', 'enabled': 'enabled',
+        'supervisor': 'supervisor', 'lastLogin': 'last_login', 'createdOn': 'ctime', 'modifiedOn': 'mtime'
+    },
+    'policies': {
+        'sourceId': 'id', 'name': 'name', 'enabled': 'enabled', 'users': 'users', 'mappings': 'mappings',
+        'simpleGroups': 'simple_groups', 'dynamicGroups': 'dynamic_groups', 'supervisors': 'supervisors',
+        'createdOn': 'ctime', 'modifiedOn': 'mtime'
+    },
+    'user_policies': {
+        'sourceId': 'id', 'userId': 'user_id', 'userName': 'user_name', 'policyId': 'policy_id',
+        'policyName': 'policy_name', 'enabled': 'enabled'
+    }
+}
+
+DEFAULT_INGESTION_BATCH_SIZE = 500
+
+ENV_OPERATIONS = ['ingest_records']
+
+ACCESS_GRAPH_ATTR = ['simple_groups', 'dynamic_groups', 'mappings', 'mapping_categories']
+
+ACCESS_GRAPH_REVERSE = {
+    'users': 'user_policies',
+    'simple_groups': 'group_policies',
+    'dynamic_groups': 'group_policies',
+    'mappings': 'mapping_policies',
+    'mapping_categories': 'category_policies'
+}
+
+ACCESS_GRAPH_TTL = 300
+
+INVENTORY_ENDPOINTS = {
+    'users': 'users',
+    'policies': 'policies',
+    'simple_groups': 'simple_group',
+    'dynamic_groups': 'dynamic_group',
+    'mappings': 'mappings',
+    'mapping_categories': 'mapping_category',
+    'webhooks': 'webhooks',
+    'certificates': 'certificates',
+    'capabilities': 'capabilities',
+    'constraints': 'constraints',
+    'device_posture_profiles': 'device_posture_profiles'
+}
+
+LIST_FILTER_PARAMS = ['name', 'enabled', 'kind', 'fields']
+
+FAN_OUT_QUERIES = {
+    'List Users': 'list_users',
+    'Get User By ID or Name': 'get_user_by_id_or_name',
+    'List User Policies': 'list_user_policies',
+    'List Policies': 'list_policies',
+    'List Mappings': 'list_mappings',
+    'List Simple Groups': 'list_simple_groups',
+    'List Dynamic Groups': 'list_dynamic_groups'
+}
+
+FAN_OUT_SOURCE_FIELD = 'source'
+
+DEFAULT_FAN_OUT_TIMEOUT = 60
+
+CREDENTIAL_CONFIG_FIELDS = ['server_url', 'api_key', 'name']
+
+NOT_FOUND_ERROR_PREFIX = 'Response [404'
+
+AUTH_ERROR_PREFIXES = ('Response [401', 'Response [403')
+
+POLICY_EXPORT_FILE = 'cyolo_policies_{0}.jsonl.gz'
+
+POLICY_EXPORT_SUFFIX = '.jsonl.gz'
+
+POLICY_EXPORT_VERSION = 1
+
+DEFAULT_IMPORT_BATCH_SIZE = 100
+
+CHANGE_EVENT_ENTITIES = {
+    'user': 'users',
+    'users': 'users',
+    'policy': 'policies',
+    'policies': 'policies',
+    'simple_group': 'simple_group',
+    'simple_groups': 'simple_group',
+    'dynamic_group': 'dynamic_group',
+    'dynamic_groups': 'dynamic_group',
+    'mapping': 'mappings',
+    'mappings': 'mappings',
+    'mapping_category': 'mapping_category',
+    'mapping_categories': 'mapping_category',
+    'webhook': 'webhooks',
+    'webhooks': 'webhooks',
+    'certificate': 'certificates',
+    'certificates': 'certificates',
+    'device_posture_profile': 'device_posture_profiles',
+    'device_posture_profiles': 'device_posture_profiles'
+}
+
+CHANGE_EVENT_ACTIONS = ['created', 'updated', 'deleted']
+
+CHANGE_EVENT_GRAPH_ENDPOINTS = ['users', 'policies', 'simple_group', 'dynamic_group', 'mappings', 'mapping_category']
+
+CHANGE_EVENT_SECRET_HEADER = 'X-Cyolo-Webhook-Secret'
+
+DEFAULT_EVENT_RECEIVER_HOST = '127.0.0.1'
+
+EVENT_RECEIVER_RETRY_INTERVAL = 60
+
+MINUTES_PER_DAY = 24 * 60
+
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
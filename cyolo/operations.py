@@ -4,31 +4,403 @@
   FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
   Copyright end """
 
+import os
+import re
+import copy
 import json
+import gzip
+import sqlite3
+import hashlib
+import hmac
+import tempfile
+import time
+import random
+import threading
 import requests
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from requests.adapters import HTTPAdapter
 from connectors.core.connector import get_logger, ConnectorError
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from .constants import *
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 logger = get_logger('cyolo')
 
+RECORD_ID_PATTERN = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
+_session_registry = {}
+_session_lock = threading.Lock()
+_policy_write_queues = {}
+_policy_write_lock = threading.Lock()
+_catalog_cache = OrderedDict()
+_catalog_cache_lock = threading.Lock()
+_name_index = {}
+_name_index_lock = threading.Lock()
+_sync_store_lock = threading.Lock()
+_rate_limit_state = {}
+_rate_limit_condition = threading.Condition()
+_circuit_state = {}
+_circuit_lock = threading.Lock()
+_inflight_requests = {}
+_inflight_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+_health_cache = {}
+_health_lock = threading.Lock()
+_access_graph = {}
+_access_graph_lock = threading.Lock()
+_event_receivers = {}
+_event_receiver_retry = {}
+_event_receiver_lock = threading.Lock()
+
+
+def get_server_url(config):
+    server_url = config.get('server_url', '').strip().rstrip('/')
+    if not server_url.startswith('https://') and not server_url.startswith('http://'):
+        server_url = "https://" + server_url
+    return server_url
+
+
+def get_config_key(config):
+    return get_server_url(config), config.get('api_key'), bool(config.get('verify_ssl'))
+
+
+def get_config_int(config, key, default, minimum=1):
+    try:
+        value = int(config.get(key))
+        return value if value >= minimum else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _new_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(config):
+    """Return a keep-alive session shared by every call made with the same configuration."""
+    key = get_config_key(config)
+    pool_size = get_config_int(config, 'pool_size', DEFAULT_POOL_SIZE)
+    idle_timeout = get_config_int(config, 'session_idle_timeout', DEFAULT_SESSION_IDLE_TIMEOUT)
+    now = time.monotonic()
+    stale = []
+    with _session_lock:
+        for other_key, entry in list(_session_registry.items()):
+            # The key carries the credentials, so a changed API key gets a fresh session and
+            # the one built for the old key is closed once it has been idle long enough.
+            if other_key != key and now - entry['last_used'] > idle_timeout:
+                stale.append(_session_registry.pop(other_key)['session'])
+        entry = _session_registry.get(key)
+        if entry and (entry['pool_size'] != pool_size or now - entry['last_used'] > idle_timeout):
+            stale.append(entry['session'])
+            entry = None
+        if not entry:
+            entry = {'session': _new_session(pool_size), 'pool_size': pool_size}
+            _session_registry[key] = entry
+        entry['last_used'] = now
+    for session in stale:
+        session.close()
+    return entry['session']
+
+
+def close_sessions():
+    with _session_lock:
+        sessions = [entry['session'] for entry in _session_registry.values()]
+        _session_registry.clear()
+    for session in sessions:
+        session.close()
+
+
+def get_rate_limit_state(server_url):
+    state = _rate_limit_state.get(server_url)
+    if not state:
+        state = {'tokens': None, 'updated': time.monotonic(), 'blocked_until': 0,
+                 'concurrency': float(BULK_MAX_WORKERS_LIMIT), 'in_flight': 0}
+        _rate_limit_state[server_url] = state
+    return state
+
+
+def wait_for_rate_limit(config):
+    """Block until the token bucket of the console allows another request."""
+    rate = get_config_int(config, 'rate_limit', DEFAULT_RATE_LIMIT, minimum=0)
+    server_url = get_server_url(config)
+    while True:
+        with _rate_limit_condition:
+            state = get_rate_limit_state(server_url)
+            now = time.monotonic()
+            if state['blocked_until'] > now:
+                delay = state['blocked_until'] - now
+            elif not rate:
+                return
+            else:
+                tokens = rate if state['tokens'] is None else state['tokens']
+                state['tokens'] = min(float(rate), tokens + (now - state['updated']) * rate)
+                state['updated'] = now
+                if state['tokens'] >= 1:
+                    state['tokens'] -= 1
+                    return
+                delay = (1 - state['tokens']) / rate
+        time.sleep(delay)
+
+
+def get_retry_delay(response, attempt):
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0), RETRY_MAX_DELAY)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                return min(max((retry_at - datetime.now(retry_at.tzinfo)).total_seconds(), 0), RETRY_MAX_DELAY)
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(RETRY_BACKOFF_BASE * 2 ** attempt, RETRY_MAX_DELAY))
+
+
+def record_throttle(config, delay):
+    with _rate_limit_condition:
+        state = get_rate_limit_state(get_server_url(config))
+        state['blocked_until'] = max(state['blocked_until'], time.monotonic() + delay)
+        state['concurrency'] = max(1.0, state['concurrency'] / 2)
+
+
+def record_success(config):
+    with _rate_limit_condition:
+        state = get_rate_limit_state(get_server_url(config))
+        if state['concurrency'] < BULK_MAX_WORKERS_LIMIT:
+            state['concurrency'] = min(float(BULK_MAX_WORKERS_LIMIT), state['concurrency'] + 1 / state['concurrency'])
+
+
+def get_timeout(config):
+    return (get_config_int(config, 'connect_timeout', DEFAULT_CONNECT_TIMEOUT),
+            get_config_int(config, 'read_timeout', DEFAULT_READ_TIMEOUT))
+
+
+def get_circuit_state(server_url):
+    state = _circuit_state.get(server_url)
+    if not state:
+        state = {'state': CIRCUIT_CLOSED, 'failures': 0, 'opened_at': 0, 'trial_in_flight': False}
+        _circuit_state[server_url] = state
+    return state
 
-def make_api_call(method="GET", endpoint="", config=None, params=None, data=None, json_data=None):
+
+def acquire_circuit(config):
+    """Fail fast while the console is unreachable, letting a single trial request through once the
+    reset timeout has passed."""
+    server_url = get_server_url(config)
+    reset_timeout = get_config_int(config, 'circuit_reset_timeout', DEFAULT_CIRCUIT_RESET_TIMEOUT)
+    with _circuit_lock:
+        state = get_circuit_state(server_url)
+        if state['state'] == CIRCUIT_CLOSED:
+            return
+        remaining = state['opened_at'] + reset_timeout - time.monotonic()
+        if state['state'] == CIRCUIT_OPEN and remaining <= 0:
+            state['state'] = CIRCUIT_HALF_OPEN
+            state['trial_in_flight'] = False
+        if state['state'] == CIRCUIT_HALF_OPEN and not state['trial_in_flight']:
+            state['trial_in_flight'] = True
+            return
+    raise ConnectorError('Circuit breaker is {0} for {1} after {2} consecutive failures, retrying in {3:.0f} '
+                         'seconds'.format(state['state'].lower(), server_url, state['failures'], max(remaining, 0)))
+
+
+def record_circuit_result(config, failed):
+    server_url = get_server_url(config)
+    threshold = get_config_int(config, 'circuit_failure_threshold', DEFAULT_CIRCUIT_FAILURE_THRESHOLD)
+    with _circuit_lock:
+        state = get_circuit_state(server_url)
+        previous = state['state']
+        state['trial_in_flight'] = False
+        if not failed:
+            state['state'] = CIRCUIT_CLOSED
+            state['failures'] = 0
+        else:
+            state['failures'] += 1
+            if previous == CIRCUIT_HALF_OPEN or state['failures'] >= threshold:
+                state['state'] = CIRCUIT_OPEN
+                state['opened_at'] = time.monotonic()
+        current = state['state']
+    if current != previous:
+        logger.warning(f"Circuit breaker for {server_url} changed from {previous} to {current}")
+
+
+def get_circuit_status(config):
+    reset_timeout = get_config_int(config, 'circuit_reset_timeout', DEFAULT_CIRCUIT_RESET_TIMEOUT)
+    with _circuit_lock:
+        state = dict(get_circuit_state(get_server_url(config)))
+    status = {'state': state['state'], 'consecutive_failures': state['failures']}
+    if state['state'] == CIRCUIT_OPEN:
+        status['retry_in'] = round(max(state['opened_at'] + reset_timeout - time.monotonic(), 0), 2)
+    return status
+
+
+@contextmanager
+def concurrency_slot(config):
+    """Bound the parallel tasks fanned out to a console, shrinking the bound while it throttles us."""
+    server_url = get_server_url(config)
+    with _rate_limit_condition:
+        state = get_rate_limit_state(server_url)
+        while state['in_flight'] >= int(state['concurrency']):
+            _rate_limit_condition.wait(1)
+        state['in_flight'] += 1
+    try:
+        yield
+    finally:
+        with _rate_limit_condition:
+            state['in_flight'] -= 1
+            _rate_limit_condition.notify_all()
+
+
+def observe_latency(group, name, elapsed, failed=False):
+    elapsed_ms = elapsed * 1000
+    with _metrics_lock:
+        metric = _metrics[group].get(name)
+        if not metric:
+            metric = {'count': 0, 'errors': 0, 'sum_ms': 0.0, 'max_ms': 0.0, 'buckets': [0] * (len(METRICS_LATENCY_BUCKETS) + 1)}
+            _metrics[group][name] = metric
+        metric['count'] += 1
+        metric['errors'] += 1 if failed else 0
+        metric['sum_ms'] += elapsed_ms
+        metric['max_ms'] = max(metric['max_ms'], elapsed_ms)
+        metric['buckets'][bisect_left(METRICS_LATENCY_BUCKETS, elapsed_ms)] += 1
+
+
+def get_endpoint_template(endpoint):
+    # Collapse the IDs in paths such as users/{id}/policies so that metrics are grouped per endpoint.
+    return '/'.join('{id}' if i % 2 else x for i, x in enumerate(endpoint.split('/')))
+
+
+def record_request_metrics(method, endpoint, elapsed, response, retry=False, stream=False):
+    observe_latency('endpoints', f"{method.upper()} {get_endpoint_template(endpoint)}", elapsed, not response.ok)
+    # A streamed body has not been read yet, so fall back to the size the console announced.
+    response_bytes = int(response.headers.get('Content-Length') or 0) if stream else len(response.content or b'')
+    with _metrics_lock:
+        _metrics['requests'] += 1
+        _metrics['retries'] += 1 if retry else 0
+        _metrics['response_bytes'] += response_bytes
+
+
+def record_operation_metrics(operation, elapsed, failed=False):
+    observe_latency('operations', operation, elapsed, failed)
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.update({'operations': {}, 'endpoints': {}, 'requests': 0, 'retries': 0, 'response_bytes': 0,
+                         'collapsed': 0, 'change_events': 0, 'since': time.time()})
+
+
+def log_payload(config, payload):
+    if config.get('log_payloads'):
+        logger.debug("payload is %s", payload)
+
+
+def make_api_call(method="GET", endpoint="", config=None, params=None, data=None, json_data=None, stream=False,
+                  collapse=True):
+    """Send a request to the console, letting concurrent identical GETs share a single in-flight request."""
+    if method.upper() != 'GET' or stream or not collapse:
+        return send_api_call(method, endpoint, config, params, data, json_data, stream)
+    key = (get_config_key(config), endpoint, json.dumps(params, sort_keys=True, default=str))
+    with _inflight_lock:
+        future = _inflight_requests.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            future.waiters_count = 0
+            _inflight_requests[key] = future
+        else:
+            future.waiters_count += 1
+    if not leader:
+        with _metrics_lock:
+            _metrics['collapsed'] += 1
+        return copy_result(future.result())
+    try:
+        result = send_api_call(method, endpoint, config, params, data, json_data, stream)
+    except Exception as err:
+        with _inflight_lock:
+            _inflight_requests.pop(key, None)
+        future.set_exception(err)
+        raise
+    # Unregister before publishing, so a caller arriving later sends a fresh request instead of
+    # reading a result that was fetched before it asked.
+    with _inflight_lock:
+        _inflight_requests.pop(key, None)
+        waiters_count = future.waiters_count
+    future.set_result(result)
+    # Callers modify what they get back, so the followers copy the shared result and the leader
+    # keeps the original only when nobody else is reading it.
+    return copy_result(result) if waiters_count else result
+
+
+def copy_result(result):
+    return copy.deepcopy(result) if isinstance(result, (dict, list)) else result
+
+
+def send_api_call(method="GET", endpoint="", config=None, params=None, data=None, json_data=None, stream=False):
     try:
         headers = {
             "accept": "application/json",
+            "Accept-Encoding": "gzip",
             'Authorization': f"Basic {config.get('api_key')}"
         }
-        server_url = config.get('server_url')
-        if not server_url.startswith('https://') and not server_url.startswith('http://'):
-            server_url = "https://" + server_url
-        url = server_url + '/v1/' + endpoint
-        response = requests.request(method=method, url=url,
-                                    headers=headers, data=data, json=json_data, params=params,
-                                    verify=config.get('verify_ssl'))
+        url = get_server_url(config) + '/v1/' + endpoint
+        max_retries = get_config_int(config, 'max_retries', DEFAULT_MAX_RETRIES, minimum=0)
+        timeout = get_timeout(config)
+        acquire_circuit(config)
+        try:
+            for attempt in range(max_retries + 1):
+                wait_for_rate_limit(config)
+                request_start = time.perf_counter()
+                response = get_session(config).request(method=method, url=url,
+                                                       headers=headers, data=data, json=json_data, params=params,
+                                                       verify=config.get('verify_ssl'), stream=stream,
+                                                       timeout=timeout)
+                record_request_metrics(method, endpoint, time.perf_counter() - request_start, response, attempt > 0, stream)
+                # A throttled request was never processed, so it is always safe to retry; server errors are
+                # only retried for methods that do not create anything.
+                retryable = response.status_code == 429 or (
+                    response.status_code in RETRY_STATUS_CODES and method.upper() in RETRY_METHODS)
+                if not retryable or attempt == max_retries:
+                    break
+                delay = get_retry_delay(response, attempt)
+                if response.status_code == 429:
+                    record_throttle(config, delay)
+                logger.warning('Response [{0}:{1}], retrying in {2:.2f} seconds'.format(
+                    response.status_code, response.reason, delay))
+                response.close()
+                time.sleep(delay)
+        except requests.exceptions.RequestException:
+            record_circuit_result(config, True)
+            raise
+        # Any answer other than a server error shows that the console is reachable.
+        record_circuit_result(config, response.status_code in RETRY_STATUS_CODES)
         if response.ok:
+            record_success(config)
+            if stream:
+                return response
             try:
-                return response.json()
+                return json_loads(response.content)
             except:
                 return response
         else:
@@ -57,48 +429,205 @@ def make_api_call(method="GET", endpoint="", config=None, params=None, data=None
         raise ConnectorError(str(err))
 
 
+def stream_records(config, endpoint, params=None):
+    """Yield the records of a list response one at a time, decoding the body incrementally when ijson is installed."""
+    response = make_api_call(endpoint=endpoint, config=config, params=params, stream=True)
+    try:
+        if ijson:
+            response.raw.decode_content = True
+            events = ijson.parse(response.raw, use_float=True)
+            # Anything but a top-level array, such as an error object, would otherwise yield no records at all.
+            if next(events, (None, None, None))[1] != 'start_array':
+                raise ConnectorError(f"Unexpected response while listing {endpoint}")
+            yield from ijson.items(events, 'item')
+            return
+        records = json_loads(response.content)
+        if not isinstance(records, list):
+            raise ConnectorError(f"Unexpected response while listing {endpoint}")
+        yield from records
+    except ConnectorError:
+        raise
+    except Exception as err:
+        raise ConnectorError(f"Failed to read the response while listing {endpoint}: {err}")
+    finally:
+        response.close()
+
+
+def first_record(config, endpoint, params):
+    records = stream_records(config, endpoint, params)
+    try:
+        return next(records, None)
+    finally:
+        records.close()
+
+
+def iter_records(config, endpoint, page_size=DEFAULT_PAGE_SIZE, offset=0):
+    """Yield the records of a list endpoint one page at a time, starting at offset."""
+    position, previous_key, held = offset, None, None
+    while True:
+        # Nothing has been yielded while the first page is held, so a whole collection restarts at offset.
+        start = offset if held is not None else position
+        page, count = [], 0
+        for record in stream_records(config, endpoint, {'limit': page_size, 'offset': position}):
+            count += 1
+            if count <= page_size:
+                page.append(record)
+                continue
+            if page is not None:
+                # The console returned the whole collection instead of a page, so page locally.
+                yield from page[start:]
+                page = None
+            if count > start:
+                yield record
+        if page is None:
+            return
+        key = value_key(page[0]) if page else None
+        if held is not None:
+            # The page after a full first page shows whether the console honoured the offset of the first one.
+            yield from held[offset:] if key == previous_key else held
+            held = None
+        if not page or key == previous_key:
+            # A full page was followed by the same records again, so the console ignores paging.
+            return
+        if position == offset and offset:
+            if count == page_size:
+                held, previous_key, position = page, key, position + page_size
+                continue
+            if key == value_key(first_record(config, endpoint, {'limit': 1, 'offset': 0})):
+                # The collection fits in one page and the console ignored the offset.
+                yield from page[offset:]
+                return
+        yield from page
+        if count < page_size:
+            return
+        previous_key = key
+        position += page_size
+
+
+def is_paginated(params):
+    return any(params.get(x) not in (None, '') for x in ('limit', 'offset', 'max_records'))
+
+
+def build_record_filter(params):
+    name = re.compile(params['name'], re.IGNORECASE) if params.get('name') else None
+    enabled = {'Enabled': True, 'Disabled': False}.get(params.get('enabled'))
+    kind = str(params.get('kind')).strip().lower() if params.get('kind') else None
+
+    def record_filter(record):
+        return ((name is None or bool(name.search(str(record.get('name') or ''))))
+                and (enabled is None or record.get('enabled') is enabled)
+                and (kind is None or str(record.get('kind') or '').lower() == kind))
+    return record_filter
+
+
+def build_record_projection(params):
+    """Return a function keeping only the requested fields; 'users.id' keeps only the id of each embedded user."""
+    projection = {}
+    for field in to_id_list(params.get('fields')):
+        head, _, sub_field = field.partition('.')
+        if not sub_field:
+            projection[head] = None
+        elif projection.get(head, set()) is not None:
+            projection.setdefault(head, set()).add(sub_field)
+
+    def project(value, sub_fields):
+        if not sub_fields:
+            return value
+        if isinstance(value, list):
+            return [project(x, sub_fields) for x in value]
+        if isinstance(value, dict):
+            return {x: value.get(x) for x in sub_fields}
+        return value
+
+    def record_projection(record):
+        return {head: project(record.get(head), sub_fields) for head, sub_fields in projection.items()}
+    return record_projection if projection else None
+
+
+def has_filters(params):
+    return any(params.get(x) not in (None, '') for x in LIST_FILTER_PARAMS)
+
+
+def list_records(config, endpoint, params):
+    if not is_paginated(params) and not has_filters(params):
+        return make_api_call(endpoint=endpoint, config=config)
+    if is_paginated(params):
+        page_size = min(get_config_int(params, 'limit', DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+        offset = max(int(params.get('offset') or 0), 0)
+        records = iter_records(config, endpoint, page_size, offset)
+    else:
+        records = stream_records(config, endpoint)
+    # Filter and project each record as it is decoded so that discarded data is never accumulated.
+    record_filter, record_projection = build_record_filter(params), build_record_projection(params)
+    records = (x for x in records if record_filter(x))
+    if record_projection:
+        records = (record_projection(x) for x in records)
+    return list(islice(records, get_config_int(params, 'max_records', None, minimum=0)))
+
+
+def cached_list_records(config, endpoint, params):
+    """List near-static reference data, served from a per-configuration TTL/LRU cache."""
+    key = (get_config_key(config), endpoint, params.get('limit'), params.get('offset'), params.get('max_records'),
+           tuple(str(params.get(x)) for x in LIST_FILTER_PARAMS))
+    if not params.get('bypass_cache'):
+        with _catalog_cache_lock:
+            entry = _catalog_cache.get(key)
+            if entry and entry['expires'] > time.monotonic():
+                _catalog_cache.move_to_end(key)
+                return copy.deepcopy(entry['response'])
+    response = list_records(config, endpoint, params)
+    with _catalog_cache_lock:
+        _catalog_cache[key] = {
+            'expires': time.monotonic() + CATALOG_CACHE_TTL.get(endpoint, DEFAULT_CATALOG_CACHE_TTL),
+            'response': copy.deepcopy(response)
+        }
+        _catalog_cache.move_to_end(key)
+        while len(_catalog_cache) > CATALOG_CACHE_MAX_ENTRIES:
+            _catalog_cache.popitem(last=False)
+    return response
+
+
+def invalidate_catalog_cache(config, endpoint=None):
+    config_key = get_config_key(config)
+    with _catalog_cache_lock:
+        for key in [x for x in _catalog_cache if x[0] == config_key and endpoint in (None, x[1])]:
+            del _catalog_cache[key]
+
+
 def list_users(config, params):
     endpoint = "users"
-    return make_api_call(endpoint=endpoint, config=config)
+    return list_records(config, endpoint, params)
 
 
 def list_user_policies(config, params):
     endpoint = f"users/{params.get('id')}/policies"
-    return make_api_call(endpoint=endpoint, config=config)
+    return list_records(config, endpoint, params)
 
 
 def update_policy(config, params):
-    endpoint = f"policies/{params.get('id')}"
-    params = build_policy_payload(params)
-    original_policy = {}
-    for policy in list_policies(config, params):
-        if policy['id'] == str(params.get('id')):
-            original_policy = policy
-            break
-    if not original_policy:
-        raise ConnectorError("Invalid Policy ID")
-    for attr in POLICY_ATTR:
-        attr_id_list = list()
-        for attr_details in original_policy[attr]:
-            attr_id_list.append(attr_details['id'])
-        original_policy[attr] = attr_id_list
-    updated_policy_payload = {}
-    for x in PAYLOAD_PARAMS:
-        if isinstance(original_policy[x], list):
-            updated_policy_payload[x] = original_policy.get(x) + params.get(x) if params.get(x) else original_policy.get(x)
-        else:
-            updated_policy_payload[x] = params.get(x) if params.get(x) or params.get(x) is False else original_policy.get(x)
-    updated_policy_payload['timed_access'] = {
-        "enabled": params.pop('timed_access_status', original_policy['timed_access']['enabled']),
-        "start": handle_date(params.get('start')) if params.get('start') else original_policy['timed_access']['start'],
-        "end": handle_date(params.get('end')) if params.get('end') else original_policy['timed_access']['end'],
-        "days": [True if x in str(params.get('days')) else False for x in DAY_LIST] if params.get('days') else original_policy['timed_access']['days']
-    }
-    updated_policy_payload['device_posture_profiles'] = original_policy.get('device_posture_profile_ids') + params.get('device_posture_profiles') if params.get('device_posture_profiles') else original_policy.get('device_posture_profile_ids')
-    logger.error(f"payload is {updated_policy_payload}")
-    response = make_api_call(method='POST', endpoint=endpoint, config=config, data=json.dumps(updated_policy_payload))
-    if response:
-        return {"status": "Successfully Updated"}
+    params = resolve_policy_params(config, build_policy_payload(params))
+
+    def edit(original_policy, updated_policy_payload):
+        for x in PAYLOAD_PARAMS:
+            if isinstance(original_policy[x], list):
+                if params.get(x):
+                    updated_policy_payload[x] = merge_ids(updated_policy_payload.get(x), params.get(x))
+            else:
+                updated_policy_payload[x] = params.get(x) if params.get(x) or params.get(x) is False else updated_policy_payload.get(x)
+        timed_access = updated_policy_payload['timed_access']
+        updated_policy_payload['timed_access'] = {
+            "enabled": params['timed_access_status'] if 'timed_access_status' in params else timed_access['enabled'],
+            "start": handle_date(params.get('start')) if params.get('start') else timed_access['start'],
+            "end": handle_date(params.get('end')) if params.get('end') else timed_access['end'],
+            "days": [True if x in str(params.get('days')) else False for x in DAY_LIST] if params.get('days') else timed_access['days']
+        }
+        if params.get('device_posture_profiles'):
+            updated_policy_payload['device_posture_profiles'] = merge_ids(
+                updated_policy_payload.get('device_posture_profiles'), params.get('device_posture_profiles'))
+
+    changes = submit_policy_edit(config, params.get('id'), edit)
+    invalidate_catalog_cache(config)
+    return {"status": "Successfully Updated", "changed": bool(changes), "changes": changes}
 
 
 def get_user_by_id_or_name(config, params):
@@ -109,13 +638,188 @@ def get_user_by_id_or_name(config, params):
 def delete_user_by_id_or_name(config, params):
     endpoint = f"users/{params.get('id')}"
     response = make_api_call(method='DELETE', endpoint=endpoint, config=config)
+    # Otherwise the user's name keeps resolving to the deleted ID until the index expires.
+    user = str(params.get('id'))
+    with _name_index_lock:
+        entry = _name_index.get((get_config_key(config), 'users'))
+    if entry and user not in entry['ids']:
+        user = entry['names'].get(user.lower(), user)
+    update_name_index(config, 'users', user)
+    invalidate_access_graph(config)
     if response:
         return {'status': 'success', 'result': 'User successfully Deleted'}
 
 
 def list_policies(config, params):
     endpoint = "policies"
-    return make_api_call(endpoint=endpoint, config=config)
+    return list_records(config, endpoint, params)
+
+
+def get_original_policy(config, policy_id):
+    # A read that is already in flight may predate the last write, and an edit built on it would undo that write.
+    original_policy = make_api_call(endpoint=f"policies/{policy_id}", config=config, collapse=False)
+    if not isinstance(original_policy, dict) or str(policy_id) not in (str(original_policy.get('id')), original_policy.get('name')):
+        raise ConnectorError("Invalid Policy ID")
+    return normalize_policy(original_policy)
+
+
+def normalize_policy(policy, references=None):
+    """Replace the entities embedded in a policy by their IDs, recording their names in references."""
+    # A single policy is returned with its groups combined and its device posture profiles
+    # embedded, while the policy list carries them separately; bring both to the same shape.
+    if 'simple_groups' not in policy and 'dynamic_groups' not in policy:
+        groups = policy.get('groups') or []
+        policy['dynamic_groups'] = [x for x in groups if 'dynamic' in str(x.get('kind'))]
+        policy['simple_groups'] = [x for x in groups if 'dynamic' not in str(x.get('kind'))]
+    if 'device_posture_profile_ids' not in policy:
+        policy['device_posture_profile_ids'] = [
+            x['id'] if isinstance(x, dict) else x for x in policy.get('device_posture_profiles') or []]
+    for attr in POLICY_ATTR + ['device_posture_profiles']:
+        attr_id_list = list()
+        for attr_details in policy.get(attr) or []:
+            if not isinstance(attr_details, dict):
+                attr_id_list.append(attr_details)
+                continue
+            attr_id_list.append(attr_details['id'])
+            name = next((attr_details[x] for x in RESOLVER_NAME_FIELDS if attr_details.get(x)), None)
+            if references is not None and name:
+                references[(attr, str(attr_details['id']))] = name
+        if attr in POLICY_ATTR:
+            policy[attr] = attr_id_list
+    for x in PAYLOAD_PARAMS:
+        policy.setdefault(x, [])
+    return policy
+
+
+def policy_to_payload(original_policy):
+    updated_policy_payload = copy.deepcopy({x: original_policy.get(x) for x in PAYLOAD_PARAMS})
+    updated_policy_payload['timed_access'] = dict(original_policy['timed_access'])
+    updated_policy_payload['device_posture_profiles'] = list(original_policy.get('device_posture_profile_ids'))
+    return updated_policy_payload
+
+
+def value_key(value):
+    # Constraints and capabilities are lists of dicts, which cannot be hashed as they are.
+    return value if isinstance(value, str) else json.dumps(value, sort_keys=True)
+
+
+def merge_ids(existing, ids):
+    """Append the values that are not yet present, keeping the existing order and dropping duplicates."""
+    existing = existing or []
+    seen = as_set(existing)
+    merged = list(existing)
+    for value in ids or []:
+        if value_key(value) not in seen:
+            seen.add(value_key(value))
+            merged.append(value)
+    return merged
+
+
+def remove_ids(existing, ids):
+    ids = as_set(ids or [])
+    return [x for x in existing or [] if value_key(x) not in ids]
+
+
+def as_set(values):
+    return {value_key(x) for x in values}
+
+
+def diff_policy_payload(original_payload, updated_payload):
+    """Return the fields that differ between two policy payloads, comparing list fields as sets."""
+    changes = {}
+    for key, value in updated_payload.items():
+        previous = original_payload.get(key)
+        if isinstance(value, list) and isinstance(previous, list) and key != 'days':
+            previous_set, value_set = as_set(previous), as_set(value)
+            added, removed = value_set - previous_set, previous_set - value_set
+            if added or removed:
+                changes[key] = {'added': sorted(added), 'removed': sorted(removed)}
+        elif value != previous:
+            changes[key] = {'from': previous, 'to': value}
+    return changes
+
+
+def changes_applied(policy, changes):
+    """Check that a policy read back after a write carries every change made by the write."""
+    payload = policy_to_payload(policy)
+    for key, change in changes.items():
+        if 'added' in change:
+            values = as_set(payload.get(key) or [])
+            if not values.issuperset(change['added']) or values.intersection(change['removed']):
+                return False
+        elif payload.get(key) != change['to']:
+            return False
+    return True
+
+
+def submit_policy_edit(config, policy_id, edit):
+    """
+    Queue an edit of a policy and wait for it to be written, returning the fields that changed. Edits to the
+    same policy that arrive while it is being written, or within the write window after that, are merged into a
+    single read and a single write, writes to a policy are serialized, and nothing is written when the edits
+    leave the policy unchanged.
+    """
+    policy_id = str(policy_id)
+    future = Future()
+    key = (get_config_key(config), policy_id)
+    with _policy_write_lock:
+        queue = _policy_write_queues.setdefault(key, {'pending': [], 'writer': threading.Lock()})
+        queue['pending'].append((edit, future))
+        leader = len(queue['pending']) == 1
+        busy = queue['writer'].locked()
+    if leader:
+        # An edit to an idle policy is written straight away; only edits queued behind a write wait for more.
+        if busy:
+            time.sleep(get_config_int(config, 'policy_write_window', DEFAULT_POLICY_WRITE_WINDOW, minimum=0) / 1000)
+        with queue['writer']:
+            with _policy_write_lock:
+                batch, queue['pending'] = queue['pending'], []
+            write_policy_edits(config, policy_id, batch)
+            with _policy_write_lock:
+                if not queue['pending'] and _policy_write_queues.get(key) is queue:
+                    del _policy_write_queues[key]
+    return future.result()
+
+
+def write_policy_edits(config, policy_id, batch):
+    try:
+        for attempt in range(POLICY_WRITE_RETRIES + 1):
+            original_policy = get_original_policy(config, policy_id)
+            updated_policy_payload = policy_to_payload(original_policy)
+            applied = []
+            for edit, future in batch:
+                try:
+                    edit(original_policy, updated_policy_payload)
+                    applied.append((edit, future))
+                except Exception as err:
+                    future.set_exception(err)
+            batch = applied
+            if not batch:
+                return
+            changes = diff_policy_payload(policy_to_payload(original_policy), updated_policy_payload)
+            if not changes:
+                logger.info(f"Policy {policy_id} already up to date, skipping the write")
+                break
+            log_payload(config, updated_policy_payload)
+            make_api_call(method='POST', endpoint=f"policies/{original_policy['id']}", config=config,
+                          data=json.dumps(updated_policy_payload))
+            invalidate_access_graph(config)
+            # The console accepts a write without checking what it was based on, and the queue only serializes the
+            # writers of this process, so another worker may have written its own copy of the policy in between:
+            # read the policy back and re-apply the edits on top of it when they did not land.
+            if changes_applied(get_original_policy(config, policy_id), changes):
+                break
+            if attempt == POLICY_WRITE_RETRIES:
+                raise ConnectorError(f"Policy {policy_id} kept changing while being updated, the update was not applied")
+            logger.warning(f"Policy {policy_id} was changed by another writer while being updated, retrying")
+        if len(batch) > 1:
+            logger.info(f"Merged {len(batch)} edits to policy {policy_id} into one write")
+        for edit, future in batch:
+            future.set_result(changes)
+    except Exception as err:
+        for edit, future in batch:
+            if not future.done():
+                future.set_exception(err)
 
 
 def get_policy_by_id_or_name(config, params):
@@ -124,78 +828,58 @@ def get_policy_by_id_or_name(config, params):
 
 
 def delete_user_from_policy(config, params):
-    endpoint = f"policies/{params.get('id')}"
     params = build_policy_payload(params)
-    original_policy = {}
-    for policy in list_policies(config, params):
-        if policy['id'] == str(params.get('id')):
-            original_policy = policy
-            break
-    if not original_policy:
-        raise ConnectorError("Invalid Policy ID")
-    for attr in POLICY_ATTR:
-        attr_id_list = list()
-        for attr_details in original_policy[attr]:
-            attr_id_list.append(attr_details['id'])
-        original_policy[attr] = attr_id_list
-    updated_policy_payload = {}
-    for x in PAYLOAD_PARAMS:
-        if isinstance(original_policy[x], list):
-            updated_policy_payload[x] = original_policy.get(x)
-        else:
-            updated_policy_payload[x] = original_policy.get(x)
-    updated_policy_payload['timed_access'] = original_policy['timed_access']
-    updated_policy_payload['device_posture_profiles'] = original_policy.get('device_posture_profile_ids')
-    updated_policy_payload['users'] = [x for x in original_policy['users'] if x not in params.get('users')]
-    logger.error(f"payload is {updated_policy_payload}")
-    response = make_api_call(method='POST', endpoint=endpoint, config=config, data=json.dumps(updated_policy_payload))
-    if response:
-        return {"status": "Successfully Updated"}
+
+    def edit(original_policy, updated_policy_payload):
+        updated_policy_payload['users'] = remove_ids(updated_policy_payload['users'], params.get('users'))
+
+    changes = submit_policy_edit(config, params.get('id'), edit)
+    return {"status": "Successfully Updated", "changed": bool(changes), "changes": changes}
 
 
 def list_simple_groups(config, params):
     endpoint = "simple_group"
-    return make_api_call(endpoint=endpoint, config=config)
+    return list_records(config, endpoint, params)
 
 
 def list_dynamic_groups(config, params):
     endpoint = "dynamic_group"
-    return make_api_call(endpoint=endpoint, config=config)
+    return list_records(config, endpoint, params)
 
 
 def list_constraints(config, params):
     endpoint = "constraints"
-    return make_api_call(endpoint=endpoint, config=config)
+    return cached_list_records(config, endpoint, params)
 
 
 def list_capabilities(config, params):
     endpoint = "capabilities"
-    return make_api_call(endpoint=endpoint, config=config)
+    return cached_list_records(config, endpoint, params)
 
 
 def list_mappings(config, params):
     endpoint = "mappings"
-    return make_api_call(endpoint=endpoint, config=config)
+    return list_records(config, endpoint, params)
 
 
 def list_device_posture_profiles(config, params):
     endpoint = "device_posture_profiles"
-    return make_api_call(endpoint=endpoint, config=config)
+    return cached_list_records(config, endpoint, params)
 
 
 def list_mapping_categories(config, params):
     endpoint = "mapping_category"
-    return make_api_call(endpoint=endpoint, config=config)
+    return cached_list_records(config, endpoint, params)
 
 
 def list_webhooks(config, params):
     endpoint = "webhooks"
-    return make_api_call(endpoint=endpoint, config=config)
+    return list_records(config, endpoint, params)
 
 
 def list_certificates(config, params):
     endpoint = "certificates"
-    return make_api_call(endpoint=endpoint, config=config)
+    return cached_list_records(config, endpoint, params)
 
 
 def build_policy_payload(params):
@@ -209,13 +893,109 @@ def build_policy_payload(params):
     return params
 
 
+def load_name_index(config, endpoint):
+    ids, names, ambiguous = set(), {}, set()
+    for record in stream_records(config, endpoint):
+        record_id = str(record.get('id'))
+        ids.add(record_id)
+        for field in RESOLVER_NAME_FIELDS:
+            name = str(record.get(field) or '').strip().lower()
+            if not name:
+                continue
+            if names.get(name, record_id) != record_id:
+                ambiguous.add(name)
+            names[name] = record_id
+    now = time.monotonic()
+    entry = {'loaded': now, 'expires': now + RESOLVER_INDEX_TTL, 'ids': ids, 'names': names, 'ambiguous': ambiguous}
+    with _name_index_lock:
+        _name_index[(get_config_key(config), endpoint)] = entry
+    return entry
+
+
+def get_name_index(config, endpoint, refresh=False):
+    with _name_index_lock:
+        entry = _name_index.get((get_config_key(config), endpoint))
+    if refresh or not entry or entry['expires'] <= time.monotonic():
+        entry = load_name_index(config, endpoint)
+    return entry
+
+
+def invalidate_name_index(config, endpoint=None):
+    config_key = get_config_key(config)
+    with _name_index_lock:
+        for key in [x for x in _name_index if x[0] == config_key and endpoint in (None, x[1])]:
+            del _name_index[key]
+
+
+def update_name_index(config, endpoint, record_id, record=None):
+    """Apply one created, renamed or deleted record (record None) to the name index, if one is loaded."""
+    key = (get_config_key(config), endpoint)
+    record_id = str(record_id)
+    with _name_index_lock:
+        entry = _name_index.get(key)
+        if not entry:
+            return
+        # Readers use the index without holding the lock, so it is replaced rather than modified.
+        ids, ambiguous = set(entry['ids']), set(entry['ambiguous'])
+        names = {name: x for name, x in entry['names'].items() if x != record_id}
+        ids.discard(record_id)
+        if record is not None:
+            ids.add(record_id)
+            for field in RESOLVER_NAME_FIELDS:
+                name = str(record.get(field) or '').strip().lower()
+                if not name:
+                    continue
+                if names.get(name, record_id) != record_id:
+                    ambiguous.add(name)
+                names[name] = record_id
+        _name_index[key] = dict(entry, ids=ids, names=names, ambiguous=ambiguous)
+
+
+def resolve_ids(config, param, values):
+    """Translate the names in values to IDs, leaving values that are already IDs untouched."""
+    # Console IDs are UUIDs, so a list of IDs is passed through without loading the index.
+    if all(RECORD_ID_PATTERN.match(x) for x in values):
+        return values
+    endpoint = RESOLVER_ENDPOINTS[param]
+    entry = get_name_index(config, endpoint)
+    if any(x not in entry['ids'] and x.lower() not in entry['names'] for x in values) \
+            and time.monotonic() - entry['loaded'] >= RESOLVER_REFRESH_INTERVAL:
+        # Something was created or renamed since the index was built. Unknown values are passed through to the
+        # console anyway, so the index is rebuilt for them at most once per interval.
+        entry = get_name_index(config, endpoint, refresh=True)
+    resolved = []
+    for value in values:
+        if value in entry['ids'] or RECORD_ID_PATTERN.match(value):
+            resolved.append(value)
+        elif value.lower() in entry['ambiguous']:
+            raise ConnectorError(f"Multiple {param} match the name '{value}', specify the ID instead")
+        else:
+            # Unknown values are passed through so that the console reports them.
+            resolved.append(entry['names'].get(value.lower(), value))
+    return resolved
+
+
+def resolve_policy_params(config, params):
+    for param in RESOLVER_ENDPOINTS:
+        if isinstance(params.get(param), list) and params.get(param):
+            params[param] = resolve_ids(config, param, params[param])
+    return params
+
+
+def to_id_list(value):
+    if not value:
+        return []
+    if not isinstance(value, list):
+        value = str(value).split(",")
+    return [str(x).strip() for x in value if str(x).strip()]
+
+
 def handle_date(str_date):
     return datetime.strptime(str_date, "%Y-%m-%dT%H:%M:%S.%fZ").strftime("%H:%M")
 
 
 def create_policy(config, params):
-    endpoint = "policies"
-    params = build_policy_payload(params)
+    params = resolve_policy_params(config, build_policy_payload(params))
     params['timed_access'] = {
         "enabled": params.pop('timed_access_status', False),
         "start": handle_date(params.pop('start')) if params.get('start') else "00:00",
@@ -223,15 +1003,1042 @@ def create_policy(config, params):
         "days": [True if x in str(params.get('days')) else False for x in DAY_LIST]
     }
     params.pop('days', "")
-    logger.error(f"payload is {params}")
-    return make_api_call(method='PUT', endpoint=endpoint, config=config, data=json.dumps(params))
+    return save_new_policy(config, params)
+
+
+def save_new_policy(config, payload):
+    log_payload(config, payload)
+    response = make_api_call(method='PUT', endpoint="policies", config=config, data=json.dumps(payload))
+    invalidate_access_graph(config)
+    invalidate_catalog_cache(config)
+    return response
+
+
+def update_policy_membership(config, policy_id, members, remove=False):
+    with concurrency_slot(config):
+        return _update_policy_membership(config, policy_id, members, remove)
+
+
+def _update_policy_membership(config, policy_id, members, remove=False):
+    def edit(original_policy, updated_policy_payload):
+        for attr, ids in members.items():
+            if remove:
+                updated_policy_payload[attr] = remove_ids(updated_policy_payload[attr], ids)
+            else:
+                updated_policy_payload[attr] = merge_ids(updated_policy_payload[attr], ids)
+
+    return submit_policy_edit(config, policy_id, edit)
+
+
+def bulk_update_policy_membership(config, params, remove=False):
+    params = build_policy_payload(params)
+    policy_ids = list(dict.fromkeys(to_id_list(params.get('policy_ids'))))
+    if not policy_ids:
+        raise ConnectorError("At least one Policy ID is required")
+    members = {x: params[x] for x in MEMBERSHIP_PARAMS if params.get(x)}
+    if not members:
+        raise ConnectorError("At least one user or group is required")
+    max_workers = min(get_config_int(params, 'max_workers', BULK_MAX_WORKERS), BULK_MAX_WORKERS_LIMIT, len(policy_ids))
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(update_policy_membership, config, policy_id, members, remove): policy_id
+                   for policy_id in policy_ids}
+        for future in as_completed(futures):
+            try:
+                changes = future.result()
+                results.append({'policy_id': futures[future], 'status': 'success', 'changed': bool(changes)})
+            except Exception as err:
+                logger.error(f"Failed to update policy {futures[future]}: {err}")
+                results.append({'policy_id': futures[future], 'status': 'failed', 'error': str(err)})
+    results.sort(key=lambda x: policy_ids.index(x['policy_id']))
+    failed = len([x for x in results if x['status'] == 'failed'])
+    return {
+        'status': 'success' if not failed else 'partial success' if failed < len(results) else 'failed',
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'results': results
+    }
+
+
+def add_members_to_policies(config, params):
+    return bulk_update_policy_membership(config, params)
+
+
+def remove_members_from_policies(config, params):
+    return bulk_update_policy_membership(config, params, remove=True)
+
+
+def resolve_offboarding_users(config, users):
+    # Deleting users by a stale name would hit whoever holds the name now, so the index is rebuilt.
+    entry = get_name_index(config, 'users', refresh=True)
+    results = []
+    for user in users:
+        result = {'user': user, 'id': None, 'status': 'pending', 'policies': [], 'deleted': False}
+        if user in entry['ids']:
+            result['id'] = user
+        elif user.lower() in entry['ambiguous']:
+            result.update({'status': 'failed', 'error': f"Multiple users match the name '{user}', specify the ID instead"})
+        elif user.lower() in entry['names']:
+            result['id'] = entry['names'][user.lower()]
+        else:
+            result.update({'status': 'not found', 'error': 'User not found'})
+        results.append(result)
+    return results
+
+
+def find_user_policies(config, user_ids):
+    """Map each policy that references one of the users to the users it references."""
+    policies = {}
+    for policy in stream_records(config, 'policies'):
+        for attr in OFFBOARDING_POLICY_ATTR:
+            for x in policy.get(attr) or []:
+                user_id = str(x['id'] if isinstance(x, dict) else x)
+                if user_id in user_ids:
+                    policies.setdefault(str(policy.get('id')), set()).add(user_id)
+    return policies
+
+
+def delete_user(config, user_id):
+    with concurrency_slot(config):
+        make_api_call(method='DELETE', endpoint=f"users/{user_id}", config=config)
+
+
+def offboard_users(config, params):
+    users = list(dict.fromkeys(to_id_list(params.get('users'))))
+    if not users:
+        raise ConnectorError("At least one user is required")
+    delete_users = params.get('delete_users', True)
+    max_workers = get_config_int(params, 'max_workers', BULK_MAX_WORKERS)
+    results = resolve_offboarding_users(config, users)
+    pending = {x['id']: x for x in results if x['status'] == 'pending'}
+    policies = find_user_policies(config, set(pending)) if pending else {}
+
+    # Every policy is rewritten once, removing all of the offboarded users it references together.
+    if policies:
+        with ThreadPoolExecutor(max_workers=min(max_workers, BULK_MAX_WORKERS_LIMIT, len(policies))) as executor:
+            futures = {executor.submit(update_policy_membership, config, policy_id,
+                                       {attr: sorted(user_ids) for attr in OFFBOARDING_POLICY_ATTR}, True): policy_id
+                       for policy_id, user_ids in policies.items()}
+            for future in as_completed(futures):
+                policy_id = futures[future]
+                try:
+                    future.result()
+                    error = None
+                except Exception as err:
+                    logger.error(f"Failed to remove users from policy {policy_id}: {err}")
+                    error = str(err)
+                for user_id in policies[policy_id]:
+                    result = pending[user_id]
+                    result['policies'].append(policy_id)
+                    if error:
+                        result['status'] = 'failed'
+                        result.setdefault('error', f"Failed to remove the user from policy {policy_id}: {error}")
+
+    # A user is only deleted once it no longer appears in any policy.
+    to_delete = [x for x in pending if pending[x]['status'] == 'pending'] if delete_users else []
+    if to_delete:
+        with ThreadPoolExecutor(max_workers=min(max_workers, BULK_MAX_WORKERS_LIMIT, len(to_delete))) as executor:
+            futures = {executor.submit(delete_user, config, user_id): user_id for user_id in to_delete}
+            for future in as_completed(futures):
+                result = pending[futures[future]]
+                try:
+                    future.result()
+                    result['deleted'] = True
+                except Exception as err:
+                    logger.error(f"Failed to delete user {futures[future]}: {err}")
+                    result.update({'status': 'failed', 'error': str(err)})
+        invalidate_name_index(config, 'users')
+        invalidate_access_graph(config)
+    for result in pending.values():
+        if result['status'] == 'pending':
+            result['status'] = 'success'
+        result['policies'].sort()
+    failed = len([x for x in results if x['status'] == 'failed'])
+    return {
+        'status': 'success' if not failed else 'partial success' if failed < len(results) else 'failed',
+        'succeeded': len([x for x in results if x['status'] == 'success']),
+        'failed': failed,
+        'not_found': len([x for x in results if x['status'] == 'not found']),
+        'policies_affected': len(policies),
+        'results': results
+    }
+
+
+def fetch_inventory_entity(config, entity):
+    start = time.perf_counter()
+    try:
+        with concurrency_slot(config):
+            result = {'data': operations['list_' + entity](config, {}), 'status': 'success'}
+    except Exception as err:
+        logger.error(f"Failed to list {entity}: {err}")
+        result = {'data': None, 'status': 'failed', 'error': str(err)}
+    result['time_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+def get_tenant_inventory(config, params):
+    entities = params.get('entities') or INVENTORY_ENTITIES
+    if not isinstance(entities, list):
+        entities = [x.strip() for x in str(entities).split(",") if x.strip()]
+    invalid = [x for x in entities if x not in INVENTORY_ENTITIES]
+    if invalid:
+        raise ConnectorError(f"Invalid entities: {', '.join(invalid)}")
+    max_workers = min(get_config_int(params, 'max_workers', len(entities)), BULK_MAX_WORKERS_LIMIT)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        inventory = dict(zip(entities, executor.map(lambda entity: fetch_inventory_entity(config, entity), entities)))
+    failed = [x for x in entities if inventory[x]['status'] == 'failed']
+    return {
+        'status': 'success' if not failed else 'partial success' if len(failed) < len(entities) else 'failed',
+        'inventory': {x: inventory[x]['data'] for x in entities},
+        'errors': {x: inventory[x]['error'] for x in failed},
+        'timings_ms': {x: inventory[x]['time_ms'] for x in entities},
+        'total_time_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
+
+
+def get_temp_path(name, suffix):
+    """Resolve a file name given to an action to a file of the temporary directory, the only place actions use."""
+    directory = os.path.realpath(tempfile.gettempdir())
+    path = os.path.realpath(os.path.join(directory, str(name)))
+    if os.path.dirname(path) != directory or not path.endswith(suffix):
+        raise ConnectorError(f"Invalid file name: {name}, specify the name of a {suffix} file in {directory}")
+    return path
+
+
+def get_sync_store_path(name=None):
+    return get_temp_path(name or SYNC_STORE_FILE, SYNC_STORE_SUFFIX)
+
+
+def get_sync_store(path=None):
+    connection = sqlite3.connect(path or get_sync_store_path(), timeout=30)
+    connection.execute("CREATE TABLE IF NOT EXISTS snapshots (config_id TEXT, entity TEXT, record_id TEXT, "
+                       "content_hash TEXT, record TEXT, PRIMARY KEY (config_id, entity, record_id))")
+    connection.execute("CREATE TABLE IF NOT EXISTS checkpoints (config_id TEXT, name TEXT, position INTEGER, "
+                       "updated TEXT, PRIMARY KEY (config_id, name))")
+    return connection
+
+
+def get_config_id(config):
+    server_url, api_key, verify_ssl = get_config_key(config)
+    return hashlib.sha256(f"{server_url}|{api_key}".encode()).hexdigest()
+
+
+def sync_entities(config, params):
+    entity = params.get('entity') or 'users'
+    if entity not in INVENTORY_ENTITIES:
+        raise ConnectorError(f"Invalid entity: {entity}")
+    # Resolved before anything is fetched, so that an invalid file name fails the action straight away.
+    path = get_sync_store_path(params.get('snapshot_path'))
+    config_id = get_config_id(config)
+    current = {}
+    for record in stream_records(config, INVENTORY_ENDPOINTS[entity]):
+        serialized = json.dumps(record, sort_keys=True)
+        current[str(record.get('id'))] = (hashlib.sha256(serialized.encode()).hexdigest(), serialized, record)
+    with _sync_store_lock:
+        connection = get_sync_store(path)
+        try:
+            with connection:
+                if params.get('reset'):
+                    connection.execute("DELETE FROM snapshots WHERE config_id = ? AND entity = ?", (config_id, entity))
+                previous = {row[0]: (row[1], row[2]) for row in connection.execute(
+                    "SELECT record_id, content_hash, record FROM snapshots WHERE config_id = ? AND entity = ?",
+                    (config_id, entity))}
+                added = [x for x in current if x not in previous]
+                changed = [x for x in current if x in previous and previous[x][0] != current[x][0]]
+                removed = [x for x in previous if x not in current]
+                connection.executemany(
+                    "INSERT OR REPLACE INTO snapshots (config_id, entity, record_id, content_hash, record) VALUES (?, ?, ?, ?, ?)",
+                    [(config_id, entity, x, current[x][0], current[x][1]) for x in added + changed])
+                connection.executemany("DELETE FROM snapshots WHERE config_id = ? AND entity = ? AND record_id = ?",
+                                       [(config_id, entity, x) for x in removed])
+        finally:
+            connection.close()
+    return {
+        'entity': entity,
+        'initial_sync': not previous,
+        'total': len(current),
+        'added': [current[x][2] for x in added],
+        'changed': [{'current': current[x][2], 'previous': json.loads(previous[x][1])} for x in changed],
+        'removed': [json.loads(previous[x][1]) for x in removed]
+    }
+
+
+def export_policies(config, params):
+    """Write every policy as one line of gzip JSON Lines, followed by the names of the entities it references."""
+    path = get_temp_path(params.get('file_path') or POLICY_EXPORT_FILE.format(
+        datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')), POLICY_EXPORT_SUFFIX)
+    references, count = {}, 0
+    start = time.perf_counter()
+    # Written next to the target and renamed at the end, so a failed export never leaves a truncated file behind.
+    temp_path = path + '.partial'
+    try:
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'type': 'header', 'version': POLICY_EXPORT_VERSION, 'server_url': get_server_url(config),
+                                'exported_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')}) + '\n')
+            for policy in stream_records(config, 'policies'):
+                payload = policy_to_payload(normalize_policy(policy, references))
+                f.write(json.dumps(dict(payload, type='policy', id=str(policy.get('id'))), separators=(',', ':')) + '\n')
+                count += 1
+            # Names let an import into another console find the matching entities there.
+            for (param, entity_id), name in sorted(references.items()):
+                f.write(json.dumps({'type': 'entity', 'param': param, 'id': entity_id, 'name': name},
+                                   separators=(',', ':')) + '\n')
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return {
+        'file_path': path,
+        'policies': count,
+        'entities': len(references),
+        'size_bytes': os.path.getsize(path),
+        'time_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
+
+
+def read_policy_export(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json_loads(line)
+
+
+def translate_references(config, payload, names):
+    """Map the exported IDs that do not exist on this console to the exported names, then resolve them."""
+    for param in RESOLVER_ENDPOINTS:
+        values = payload.get(param)
+        if not values or not isinstance(values, list):
+            continue
+        if any((param, x) in names for x in values):
+            ids = get_name_index(config, RESOLVER_ENDPOINTS[param])['ids']
+            payload[param] = [x if x in ids else names.get((param, x), x) for x in values]
+    return resolve_policy_params(config, payload)
+
+
+def policy_fingerprint(payload):
+    canonical = {k: sorted(as_set(v)) if isinstance(v, list) else v for k, v in payload.items()}
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+def import_policy(config, record, names, existing, create_missing):
+    payload = build_policy_payload({k: v for k, v in record.items() if k not in ('type', 'id')})
+    payload = translate_references(config, payload, names)
+    policy_id = record.get('id') if record.get('id') in existing['ids'] else existing['names'].get(record.get('name'))
+
+    def edit(original_policy, updated_policy_payload):
+        updated_policy_payload.update(copy.deepcopy(payload))
+
+    # The policy list already showed this policy in the exported state, so there is nothing to fetch or write.
+    if policy_id and existing['fingerprints'].get(policy_id) == policy_fingerprint(payload):
+        return 'unchanged'
+    with concurrency_slot(config):
+        if policy_id:
+            return 'updated' if submit_policy_edit(config, policy_id, edit) else 'unchanged'
+        if not create_missing:
+            return 'skipped'
+        save_new_policy(config, payload)
+        return 'created'
+
+
+def import_policies(config, params):
+    if not params.get('file_path'):
+        raise ConnectorError("Export file not specified")
+    path = get_temp_path(params.get('file_path'), POLICY_EXPORT_SUFFIX)
+    if not os.path.isfile(path):
+        raise ConnectorError(f"Export file not found: {path}")
+    try:
+        header = next(read_policy_export(path), None)
+    except (OSError, ValueError) as err:
+        raise ConnectorError(f"Invalid export file: {err}")
+    if not header or header.get('type') != 'header' or header.get('version') != POLICY_EXPORT_VERSION:
+        raise ConnectorError("Invalid export file: unsupported format or version")
+    # The entity names are few compared to the policies, so they are read in a first pass and kept in memory.
+    names = {(x['param'], x['id']): x['name'] for x in read_policy_export(path) if x.get('type') == 'entity'}
+    existing = {'ids': set(), 'names': {}, 'fingerprints': {}}
+    for policy in stream_records(config, 'policies'):
+        policy_id = str(policy.get('id'))
+        existing['ids'].add(policy_id)
+        existing['names'][policy.get('name')] = policy_id
+        existing['fingerprints'][policy_id] = policy_fingerprint(
+            build_policy_payload(policy_to_payload(normalize_policy(policy))))
+    create_missing = params.get('create_missing', True)
+    batch_size = get_config_int(params, 'batch_size', DEFAULT_IMPORT_BATCH_SIZE)
+    max_workers = min(get_config_int(params, 'max_workers', BULK_MAX_WORKERS), BULK_MAX_WORKERS_LIMIT)
+    summary = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0}
+    errors = []
+    start = time.perf_counter()
+
+    def apply(record):
+        try:
+            return import_policy(config, record, names, existing, create_missing), None
+        except Exception as err:
+            logger.error(f"Failed to import policy {record.get('name')}: {err}")
+            return 'failed', {'policy': record.get('name'), 'id': record.get('id'), 'error': str(err)}
+
+    records = (x for x in read_policy_export(path) if x.get('type') == 'policy')
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Only one batch is held in memory at a time, however large the export is.
+        for batch in iter(lambda: list(islice(records, batch_size)), []):
+            for outcome, error in executor.map(apply, batch):
+                summary[outcome] += 1
+                if error:
+                    errors.append(error)
+    total = sum(summary.values())
+    return dict(summary, **{
+        'status': 'success' if not summary['failed'] else 'partial success' if summary['failed'] < total else 'failed',
+        'total': total,
+        'errors': errors,
+        'time_ms': round((time.perf_counter() - start) * 1000, 2)
+    })
+
+
+def format_prometheus_histogram(lines, name, label, metrics):
+    lines.append(f"# TYPE {name} histogram")
+    for key, metric in sorted(metrics.items()):
+        cumulative = 0
+        for bound, count in zip(METRICS_LATENCY_BUCKETS + ['+Inf'], metric['buckets']):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {round(metric["sum_ms"], 3)}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {metric["count"]}')
+
+
+def format_prometheus(snapshot):
+    lines = []
+    format_prometheus_histogram(lines, 'cyolo_operation_latency_ms', 'operation', snapshot['operations'])
+    format_prometheus_histogram(lines, 'cyolo_http_request_latency_ms', 'endpoint', snapshot['endpoints'])
+    for name in ('requests', 'retries', 'response_bytes', 'collapsed', 'change_events'):
+        lines.append(f"# TYPE cyolo_http_{name}_total counter")
+        lines.append(f"cyolo_http_{name}_total {snapshot[name]}")
+    lines.append("# TYPE cyolo_health_probe_latency_ms gauge")
+    for server_url, health in sorted(snapshot['health'].items()):
+        lines.append(f'cyolo_health_probe_latency_ms{{server="{server_url}"}} {health["latency_ms"]}')
+    lines.append("# TYPE cyolo_circuit_breaker_open gauge")
+    for server_url, circuit in sorted(snapshot['circuit_breakers'].items()):
+        lines.append(f'cyolo_circuit_breaker_open{{server="{server_url}"}} {int(circuit["state"] != CIRCUIT_CLOSED)}')
+    return '\n'.join(lines) + '\n'
+
+
+def get_connector_metrics(config, params):
+    with _metrics_lock:
+        snapshot = copy.deepcopy(_metrics)
+    if params.get('reset'):
+        reset_metrics()
+    with _health_lock:
+        snapshot['health'] = {x['server_url']: {'latency_ms': x['latency_ms'], 'checked_at': x['checked_at']}
+                              for x in _health_cache.values()}
+    with _circuit_lock:
+        snapshot['circuit_breakers'] = {server_url: {'state': x['state'], 'consecutive_failures': x['failures']}
+                                        for server_url, x in _circuit_state.items()}
+    if params.get('output_format') == 'Prometheus':
+        return {'metrics': format_prometheus(snapshot)}
+    for group in ('operations', 'endpoints'):
+        for metric in snapshot[group].values():
+            metric['avg_ms'] = round(metric['sum_ms'] / metric['count'], 3) if metric['count'] else 0
+            metric['sum_ms'] = round(metric['sum_ms'], 3)
+            metric['max_ms'] = round(metric['max_ms'], 3)
+            metric['buckets'] = dict(zip([str(x) for x in METRICS_LATENCY_BUCKETS] + ['+Inf'], metric['buckets']))
+    return snapshot
+
+
+def probe_health(config):
+    """Make the cheapest authenticated request, reusing a recent successful result."""
+    key = get_config_key(config)
+    with _health_lock:
+        entry = _health_cache.get(key)
+    # A breaker that is not closed means the console failed since the cached probe, so probe again.
+    if entry and entry['expires'] > time.monotonic() and get_circuit_status(config)['state'] == CIRCUIT_CLOSED:
+        return entry
+    start = time.perf_counter()
+    make_api_call(endpoint=HEALTH_CHECK_ENDPOINT, config=config, params={'limit': 1, 'offset': 0})
+    latency_ms = round((time.perf_counter() - start) * 1000, 2)
+    entry = {
+        'server_url': key[0],
+        'latency_ms': latency_ms,
+        'checked_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'expires': time.monotonic() + get_config_int(config, 'health_check_ttl', DEFAULT_HEALTH_CHECK_TTL, minimum=0)
+    }
+    with _health_lock:
+        _health_cache[key] = entry
+    logger.info(f"Health check against {key[0]} succeeded in {latency_ms} ms")
+    return entry
+
+
+def load_checkpoint(config, name, path=None):
+    with _sync_store_lock:
+        connection = get_sync_store(path)
+        try:
+            row = connection.execute("SELECT position FROM checkpoints WHERE config_id = ? AND name = ?",
+                                     (get_config_id(config), name)).fetchone()
+        finally:
+            connection.close()
+    return row[0] if row else 0
+
+
+def save_checkpoint(config, name, position, path=None):
+    with _sync_store_lock:
+        connection = get_sync_store(path)
+        try:
+            with connection:
+                if position is None:
+                    connection.execute("DELETE FROM checkpoints WHERE config_id = ? AND name = ?",
+                                       (get_config_id(config), name))
+                else:
+                    connection.execute("INSERT OR REPLACE INTO checkpoints (config_id, name, position, updated) "
+                                       "VALUES (?, ?, ?, ?)", (get_config_id(config), name, position,
+                                                               datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')))
+        finally:
+            connection.close()
+
+
+def map_ingestion_record(entity, record):
+    mapped = {}
+    for target, source in INGESTION_FIELD_MAP[entity].items():
+        value = record.get(source)
+        if isinstance(value, list):
+            value = [x.get('id') if isinstance(x, dict) else x for x in value]
+        mapped[target] = value
+    mapped['source'] = 'Cyolo'
+    return mapped
+
+
+def iter_ingestion_records(config, entity, offset, page_size):
+    """Yield the mapped records of each source record, starting at the source record at offset."""
+    endpoint = 'users' if entity == 'user_policies' else entity
+    for record in iter_records(config, endpoint, page_size, offset):
+        if entity != 'user_policies':
+            yield [map_ingestion_record(entity, record)]
+            continue
+        policies = make_api_call(endpoint=f"users/{record.get('id')}/policies", config=config) or []
+        yield [map_ingestion_record(entity, {
+            'id': f"{record.get('id')}:{policy.get('id')}", 'user_id': record.get('id'), 'user_name': record.get('name'),
+            'policy_id': policy.get('id'), 'policy_name': policy.get('name'), 'enabled': policy.get('enabled')
+        }) for policy in policies]
+
+
+def ingest_records(config, params, env=None):
+    entity = params.get('entity') or 'users'
+    if entity not in INGESTION_FIELD_MAP:
+        raise ConnectorError(f"Invalid entity: {entity}")
+    batch_size = get_config_int(params, 'batch_size', DEFAULT_INGESTION_BATCH_SIZE)
+    page_size = min(get_config_int(params, 'limit', DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+    create_pb_id = params.get('create_pb_id')
+    # Resolved before anything is ingested, so that an invalid file name cannot fail the run after the first batch.
+    checkpoint_path = get_sync_store_path(params.get('checkpoint_path'))
+    checkpoint = f"ingest:{entity}"
+    start = load_checkpoint(config, checkpoint, checkpoint_path) if create_pb_id and params.get('resume', True) else 0
+    position, ingested, batches, batch, preview = start, 0, 0, [], []
+
+    def flush():
+        # Without an ingestion playbook the records are only returned, so there is nothing to resume.
+        if create_pb_id:
+            from integrations.crudhub import trigger_ingest_playbook
+            trigger_ingest_playbook(batch, create_pb_id, parent_env=env or {}, batch_size=batch_size,
+                                    dedup_field='sourceId')
+            save_checkpoint(config, checkpoint, position, checkpoint_path)
+        else:
+            preview.extend(batch)
+
+    for records in iter_ingestion_records(config, entity, start, page_size):
+        batch.extend(records)
+        position += 1
+        if len(batch) >= batch_size:
+            flush()
+            ingested, batches, batch = ingested + len(batch), batches + 1, []
+    if batch:
+        flush()
+        ingested, batches = ingested + len(batch), batches + 1
+    if create_pb_id:
+        save_checkpoint(config, checkpoint, None, checkpoint_path)
+    logger.info(f"Ingested {ingested} {entity} records in {batches} batches, resuming from {start}")
+    result = {'entity': entity, 'resumed_from': start, 'ingested': ingested, 'batches': batches}
+    if not create_pb_id:
+        result['records'] = preview
+    return result
+
+
+def build_access_graph(config):
+    endpoints = ['policies', 'simple_group', 'users', 'mappings']
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        policies, simple_groups, users, mappings = executor.map(
+            lambda endpoint: list(stream_records(config, endpoint)), endpoints)
+    graph = {
+        'policies': {},
+        'names': {attr: {} for attr in ACCESS_GRAPH_ATTR + ['users']},
+        'user_policies': {}, 'user_groups': {}, 'group_members': {},
+        'group_policies': {}, 'mapping_policies': {}, 'category_policies': {}, 'schedules': {},
+        'built_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'expires': time.monotonic() + ACCESS_GRAPH_TTL
+    }
+    for record in users:
+        graph['names']['users'][str(record.get('id'))] = record.get('name')
+    for record in mappings:
+        graph['names']['mappings'][str(record.get('id'))] = record.get('name')
+    for group in simple_groups:
+        group_id = str(group.get('id'))
+        graph['names']['simple_groups'][group_id] = group.get('name')
+        members = {str(x.get('id') if isinstance(x, dict) else x) for x in group.get('users') or group.get('members') or []}
+        graph['group_members'][group_id] = members
+        for user_id in members:
+            graph['user_groups'].setdefault(user_id, set()).add(group_id)
+    for policy in policies:
+        policy_id = str(policy.get('id'))
+        node = {'name': policy.get('name'), 'enabled': policy.get('enabled')}
+        for attr in ACCESS_GRAPH_ATTR + ['users']:
+            node[attr] = set()
+            for item in policy.get(attr) or []:
+                item_id = str(item.get('id') if isinstance(item, dict) else item)
+                node[attr].add(item_id)
+                if isinstance(item, dict) and item.get('name'):
+                    graph['names'][attr].setdefault(item_id, item.get('name'))
+                graph[ACCESS_GRAPH_REVERSE[attr]].setdefault(item_id, set()).add(policy_id)
+        graph['policies'][policy_id] = node
+        graph['schedules'].setdefault(schedule_key(policy.get('timed_access')), {'policies': []})['policies'].append(policy_id)
+    # Policies sharing a window are evaluated together, so a query costs one check per distinct window.
+    for key, schedule in graph['schedules'].items():
+        schedule['boundaries'] = compile_schedule(key) if key else []
+    return graph
+
+
+def get_access_graph(config, refresh=False):
+    key = get_config_key(config)
+    with _access_graph_lock:
+        graph = _access_graph.get(key)
+    if refresh or not graph or graph['expires'] <= time.monotonic():
+        graph = build_access_graph(config)
+        with _access_graph_lock:
+            _access_graph[key] = graph
+    return graph
+
+
+def invalidate_access_graph(config):
+    with _access_graph_lock:
+        _access_graph.pop(get_config_key(config), None)
+
+
+def find_graph_node(graph, attr, value):
+    value = str(value).strip()
+    names = graph['names'][attr]
+    if value in names or value in graph[ACCESS_GRAPH_REVERSE[attr]]:
+        return value
+    matches = [x for x, name in names.items() if str(name).lower() == value.lower()]
+    if len(matches) > 1:
+        raise ConnectorError(f"Multiple {attr} match the name '{value}', specify the ID instead")
+    if not matches:
+        raise ConnectorError(f"No {attr} found with the ID or name '{value}'")
+    return matches[0]
+
+
+def graph_entities(graph, attr, ids):
+    return [{'id': x, 'name': graph['names'][attr].get(x)} for x in sorted(ids)]
+
+
+def get_effective_access(config, params):
+    graph = get_access_graph(config, params.get('refresh'))
+    user_id = find_graph_node(graph, 'users', params.get('user'))
+    via = {}
+    for policy_id in graph['user_policies'].get(user_id, ()):
+        via.setdefault(policy_id, []).append('direct')
+    groups = graph['user_groups'].get(user_id, set())
+    for group_id in groups:
+        for policy_id in graph['group_policies'].get(group_id, ()):
+            via.setdefault(policy_id, []).append(f"simple_group:{graph['names']['simple_groups'].get(group_id) or group_id}")
+    policies, mappings, categories = [], set(), set()
+    for policy_id, paths in sorted(via.items()):
+        policy = graph['policies'][policy_id]
+        if not policy['enabled'] and not params.get('include_disabled'):
+            continue
+        policies.append({'id': policy_id, 'name': policy['name'], 'enabled': policy['enabled'], 'via': paths})
+        mappings |= policy['mappings']
+        categories |= policy['mapping_categories']
+    return {
+        'user': {'id': user_id, 'name': graph['names']['users'].get(user_id)},
+        'simple_groups': graph_entities(graph, 'simple_groups', groups),
+        'policies': policies,
+        'mappings': graph_entities(graph, 'mappings', mappings),
+        'mapping_categories': graph_entities(graph, 'mapping_categories', categories),
+        'graph_built_at': graph['built_at']
+    }
+
+
+def who_can_access(config, params):
+    graph = get_access_graph(config, params.get('refresh'))
+    if params.get('mapping'):
+        target = {'mapping': find_graph_node(graph, 'mappings', params.get('mapping'))}
+        policy_ids = graph['mapping_policies'].get(target['mapping'], set())
+    elif params.get('mapping_category'):
+        target = {'mapping_category': find_graph_node(graph, 'mapping_categories', params.get('mapping_category'))}
+        policy_ids = graph['category_policies'].get(target['mapping_category'], set())
+    else:
+        raise ConnectorError("Specify either a mapping or a mapping category")
+    policies, users, simple_groups, dynamic_groups = [], {}, set(), set()
+    for policy_id in sorted(policy_ids):
+        policy = graph['policies'][policy_id]
+        if not policy['enabled'] and not params.get('include_disabled'):
+            continue
+        policies.append({'id': policy_id, 'name': policy['name'], 'enabled': policy['enabled']})
+        for user_id in policy['users']:
+            users.setdefault(user_id, set()).add('direct')
+        for group_id in policy['simple_groups']:
+            simple_groups.add(group_id)
+            for user_id in graph['group_members'].get(group_id, ()):
+                users.setdefault(user_id, set()).add(f"simple_group:{graph['names']['simple_groups'].get(group_id) or group_id}")
+        dynamic_groups |= policy['dynamic_groups']
+    return {
+        'target': target,
+        'policies': policies,
+        'users': [{'id': x, 'name': graph['names']['users'].get(x), 'via': sorted(users[x])} for x in sorted(users)],
+        'simple_groups': graph_entities(graph, 'simple_groups', simple_groups),
+        # Dynamic group membership is evaluated by the console and is not expanded here.
+        'dynamic_groups': graph_entities(graph, 'dynamic_groups', dynamic_groups),
+        'graph_built_at': graph['built_at']
+    }
+
+
+def load_json_param(value, name):
+    if isinstance(value, str):
+        try:
+            return json.loads(value) if value.strip() else None
+        except ValueError:
+            raise ConnectorError(f"Invalid JSON in {name}")
+    return value
+
+
+def get_fan_out_configs(config, params):
+    """Build one configuration per console, inheriting the tuning options of the current configuration."""
+    configurations = load_json_param(params.get('configurations'), 'configurations') or []
+    if isinstance(configurations, dict):
+        configurations = [configurations]
+    defaults = {k: v for k, v in config.items() if k not in CREDENTIAL_CONFIG_FIELDS}
+    consoles = [config] if params.get('include_current', True) else []
+    for item in configurations:
+        if not isinstance(item, dict) or not item.get('server_url') or not item.get('api_key'):
+            raise ConnectorError("Each configuration must specify a server_url and an api_key")
+        consoles.append(dict(defaults, **item))
+    if not consoles:
+        raise ConnectorError("Specify at least one configuration")
+    unique = OrderedDict()
+    for console in consoles:
+        unique.setdefault(get_config_key(console), console)
+    return list(unique.values())
+
+
+def tag_records(result, source):
+    records = result if isinstance(result, list) else [result] if result else []
+    return [dict(x, **{FAN_OUT_SOURCE_FIELD: source}) if isinstance(x, dict) else x for x in records]
+
+
+def query_console(action, console, source, query_params):
+    start = time.perf_counter()
+    try:
+        data = tag_records(action(console, dict(query_params)), source)
+        result = {'status': 'success', 'data': data, 'count': len(data)}
+    except Exception as err:
+        # A missing record is an answer for a lookup, not a failure of the console.
+        if str(err).startswith(NOT_FOUND_ERROR_PREFIX):
+            result = {'status': 'not found', 'data': [], 'count': 0}
+        else:
+            logger.error(f"Query against {source} failed: {err}")
+            result = {'status': 'failed', 'data': [], 'count': 0, 'error': str(err)}
+    result['time_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+def query_all_consoles(config, params):
+    query = params.get('query')
+    if query not in FAN_OUT_QUERIES:
+        raise ConnectorError(f"Invalid query: {query}")
+    action = operations[FAN_OUT_QUERIES[query]]
+    query_params = load_json_param(params.get('query_params'), 'query_params') or {}
+    consoles = get_fan_out_configs(config, params)
+    sources = [x.get('name') or get_server_url(x) for x in consoles]
+    if len(set(sources)) < len(sources):
+        raise ConnectorError("Each configuration must have a unique name")
+    max_workers = min(get_config_int(params, 'max_workers', BULK_MAX_WORKERS), BULK_MAX_WORKERS_LIMIT, len(consoles))
+    timeout = get_config_int(params, 'timeout', DEFAULT_FAN_OUT_TIMEOUT)
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(query_console, action, console, source, query_params)
+               for console, source in zip(consoles, sources)]
+    wait(futures, timeout=timeout)
+    # Consoles that have not answered in time are reported as such; their requests finish in the
+    # background, bounded by the read timeout of their configuration.
+    executor.shutdown(wait=False, cancel_futures=True)
+    results, data = {}, []
+    for source, future in zip(sources, futures):
+        if future.done() and not future.cancelled():
+            results[source] = future.result()
+        else:
+            results[source] = {'status': 'timed out', 'data': [], 'count': 0,
+                               'error': f"No response within {timeout} seconds"}
+        data.extend(results[source].pop('data'))
+    failed = [x for x in sources if results[x]['status'] in ('failed', 'timed out')]
+    return {
+        'status': 'success' if not failed else 'partial success' if len(failed) < len(sources) else 'failed',
+        'data': data,
+        'consoles': results,
+        'total_time_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
+
+
+def parse_change_event(event):
+    """Return the endpoint, action, record ID and record of a Cyolo change event, such as user.deleted."""
+    if not isinstance(event, dict):
+        raise ConnectorError("A change event must be a JSON object")
+    event_type = str(event.get('event') or event.get('type') or '')
+    entity = str(event.get('entity') or event.get('resource') or event_type.split('.')[0]).lower()
+    action = str(event.get('action') or (event_type.split('.', 1)[1] if '.' in event_type else 'updated')).lower()
+    record = event.get('data') or event.get('record') or {}
+    record_id = event.get('id') or record.get('id')
+    if entity not in CHANGE_EVENT_ENTITIES:
+        raise ConnectorError(f"Unsupported change event entity: {entity}")
+    if action not in CHANGE_EVENT_ACTIONS:
+        raise ConnectorError(f"Unsupported change event action: {action}")
+    if not record_id:
+        raise ConnectorError("A change event must carry the ID of the changed record")
+    return CHANGE_EVENT_ENTITIES[entity], action, str(record_id), record
+
+
+def apply_changed_record(config, endpoint, record_id):
+    """Index the names of a created or updated record as the console reports them, never as the event claims."""
+    try:
+        record = make_api_call(endpoint=f"{endpoint}/{record_id}", config=config, collapse=False)
+    except ConnectorError as err:
+        if str(err).startswith(NOT_FOUND_ERROR_PREFIX):
+            update_name_index(config, endpoint, record_id)
+        else:
+            # The record could not be confirmed, so the next lookup reloads the index instead.
+            invalidate_name_index(config, endpoint)
+        return
+    if isinstance(record, dict) and str(record.get('id')) == record_id:
+        update_name_index(config, endpoint, record_id, record)
+    else:
+        invalidate_name_index(config, endpoint)
+
+
+def apply_change_event(config, event):
+    """Bring the caches and indexes built for a configuration up to date with one change on the console."""
+    endpoint, action, record_id, record = parse_change_event(event)
+    if endpoint in RESOLVER_ENDPOINTS.values():
+        if action == 'deleted':
+            update_name_index(config, endpoint, record_id)
+        else:
+            apply_changed_record(config, endpoint, record_id)
+    if endpoint in CATALOG_CACHE_TTL:
+        invalidate_catalog_cache(config, endpoint)
+    if endpoint in CHANGE_EVENT_GRAPH_ENDPOINTS:
+        invalidate_access_graph(config)
+    with _metrics_lock:
+        _metrics['change_events'] += 1
+    logger.debug(f"Applied {action} event for {endpoint} {record_id}")
+    return {'entity': endpoint, 'action': action, 'id': record_id}
+
+
+class ChangeEventHandler(BaseHTTPRequestHandler):
+    """Accept Cyolo webhook deliveries, a single event or a list of events per request."""
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        config = self.server.config
+        secret = config.get('event_receiver_secret')
+        if not secret or not hmac.compare_digest(str(self.headers.get(CHANGE_EVENT_SECRET_HEADER) or ''), str(secret)):
+            self.send_json(401, {'error': 'Invalid secret'})
+            return
+        try:
+            body = json_loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+            events = body if isinstance(body, list) else [body]
+            # Every event is validated before any is applied, so a bad delivery changes nothing.
+            for event in events:
+                parse_change_event(event)
+        except (ConnectorError, ValueError) as err:
+            self.send_json(400, {'error': str(err)})
+            return
+        self.send_json(200, {'applied': [apply_change_event(config, x) for x in events]})
+
+
+def ensure_event_receiver(config):
+    """Start the change event receiver configured for a console, once per process and port."""
+    port = get_config_int(config, 'event_receiver_port', 0, minimum=0)
+    if not port:
+        return None
+    host = config.get('event_receiver_host') or DEFAULT_EVENT_RECEIVER_HOST
+    with _event_receiver_lock:
+        if (host, port) in _event_receivers:
+            return _event_receivers[(host, port)]
+        if _event_receiver_retry.get((host, port), 0) > time.monotonic():
+            return None
+        # Failed attempts are retried after an interval rather than on every action.
+        _event_receiver_retry[(host, port)] = time.monotonic() + EVENT_RECEIVER_RETRY_INTERVAL
+        if not config.get('event_receiver_secret'):
+            logger.error(f"Not starting the change event receiver on {host}:{port} without a Change Event Secret")
+            return None
+        try:
+            server = ThreadingHTTPServer((host, port), ChangeEventHandler)
+        except OSError as err:
+            # Another worker process may already be listening; this one keeps relying on the cache TTLs.
+            logger.warning(f"Could not start the change event receiver on {host}:{port}: {err}")
+            return None
+        server.daemon_threads = True
+        server.config = config
+        threading.Thread(target=server.serve_forever, name=f"cyolo-events-{port}", daemon=True).start()
+        logger.info(f"Listening for Cyolo change events on {host}:{port}")
+        _event_receivers[(host, port)] = server
+        _event_receiver_retry.pop((host, port), None)
+    return server
+
+
+def stop_event_receiver(config):
+    port = get_config_int(config, 'event_receiver_port', 0, minimum=0)
+    host = config.get('event_receiver_host') or DEFAULT_EVENT_RECEIVER_HOST
+    with _event_receiver_lock:
+        server = _event_receivers.pop((host, port), None)
+        _event_receiver_retry.pop((host, port), None)
+    if server:
+        server.shutdown()
+        server.server_close()
+
+
+def process_change_events(config, params):
+    events = load_json_param(params.get('events'), 'events') or []
+    events = events if isinstance(events, list) else [events]
+    for event in events:
+        parse_change_event(event)
+    return {'applied': [apply_change_event(config, x) for x in events]}
+
+
+def parse_minutes(value):
+    try:
+        hours, minutes = str(value).split(':')[:2]
+        return (int(hours) * 60 + int(minutes)) % MINUTES_PER_DAY
+    except ValueError:
+        return 0
+
+
+def schedule_key(timed_access):
+    """Pack a timed access window into (day bitmask, start minute, end minute), None when access is not timed."""
+    if not timed_access or not timed_access.get('enabled'):
+        return None
+    mask = 0
+    for day, allowed in enumerate((timed_access.get('days') or [])[:len(DAY_LIST)]):
+        if allowed:
+            mask |= 1 << day
+    return mask, parse_minutes(timed_access.get('start')), parse_minutes(timed_access.get('end'))
+
+
+def compile_schedule(key):
+    """Expand a packed window into the sorted minutes of the week at which access alternately opens and closes."""
+    mask, start, end = key
+    # A window ending before it starts runs past midnight, and one ending when it starts lasts the whole day.
+    length = (end - start) % MINUTES_PER_DAY or MINUTES_PER_DAY
+    intervals = []
+    for day in range(len(DAY_LIST)):
+        if mask >> day & 1:
+            opens = day * MINUTES_PER_DAY + start
+            closes = opens + length
+            if closes > MINUTES_PER_WEEK:
+                intervals += [(opens, MINUTES_PER_WEEK), (0, closes - MINUTES_PER_WEEK)]
+            else:
+                intervals.append((opens, closes))
+    merged = []
+    for opens, closes in sorted(intervals):
+        if merged and opens <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], closes)
+        else:
+            merged.append([opens, closes])
+    return [x for interval in merged for x in interval]
+
+
+def schedule_active(boundaries, minute):
+    return bisect_right(boundaries, minute) % 2 == 1
+
+
+def schedule_next_change(boundaries, minute):
+    """Return the minutes until the schedule next opens or closes, None when it never does."""
+    for boundary in sorted(set(boundaries), key=lambda x: (x - minute - 1) % MINUTES_PER_WEEK):
+        boundary %= MINUTES_PER_WEEK
+        # A window closing at the end of the week and reopening at its start is not a change.
+        if schedule_active(boundaries, boundary) != schedule_active(boundaries, (boundary - 1) % MINUTES_PER_WEEK):
+            return (boundary - minute - 1) % MINUTES_PER_WEEK + 1
+    return None
+
+
+def parse_query_time(params):
+    value = params.get('time')
+    try:
+        at = datetime.fromisoformat(str(value).replace('Z', '+00:00')) if value else datetime.now(timezone.utc)
+        if not at.tzinfo:
+            at = at.replace(tzinfo=timezone.utc)
+        if params.get('timezone'):
+            at = at.astimezone(ZoneInfo(params.get('timezone')))
+    except ValueError:
+        raise ConnectorError(f"Invalid time: {value}")
+    except ZoneInfoNotFoundError:
+        raise ConnectorError(f"Invalid timezone: {params.get('timezone')}")
+    return at.replace(second=0, microsecond=0)
+
+
+def get_active_policies(config, params):
+    graph = get_access_graph(config, params.get('refresh'))
+    at = parse_query_time(params)
+    # Days are counted from Sunday, as in DAY_LIST.
+    minute = (at.isoweekday() % 7) * MINUTES_PER_DAY + at.hour * 60 + at.minute
+    selected = None
+    if params.get('user'):
+        user_id = find_graph_node(graph, 'users', params.get('user'))
+        selected = set(graph['user_policies'].get(user_id, ()))
+        for group_id in graph['user_groups'].get(user_id, ()):
+            selected |= graph['group_policies'].get(group_id, set())
+    if params.get('policies'):
+        names = {str(x['name']).lower(): policy_id for policy_id, x in graph['policies'].items()}
+        policy_ids = {x if x in graph['policies'] else names.get(x.lower(), x) for x in to_id_list(params.get('policies'))}
+        selected = policy_ids if selected is None else selected & policy_ids
+    active, inactive = [], []
+    for key, schedule in graph['schedules'].items():
+        is_open = key is None or schedule_active(schedule['boundaries'], minute)
+        minutes = schedule_next_change(schedule['boundaries'], minute) if key else None
+        next_change = (at + timedelta(minutes=minutes)).isoformat() if minutes else None
+        for policy_id in schedule['policies']:
+            policy = graph['policies'][policy_id]
+            if (selected is not None and policy_id not in selected) or (not policy['enabled'] and not params.get('include_disabled')):
+                continue
+            record = {'id': policy_id, 'name': policy['name'], 'enabled': policy['enabled'], 'timed': key is not None,
+                      'next_change': next_change if policy['enabled'] else None}
+            (active if is_open and policy['enabled'] else inactive).append(record)
+    active.sort(key=lambda x: str(x['name']))
+    inactive.sort(key=lambda x: str(x['name']))
+    return {
+        'time': at.isoformat(),
+        'active_count': len(active),
+        'inactive_count': len(inactive),
+        'active': active,
+        'inactive': inactive,
+        'graph_built_at': graph['built_at']
+    }
 
 
 def _check_health(config):
     try:
-        list_users(config, params={})
+        probe_health(config)
         return True
     except Exception as e:
+        circuit = get_circuit_status(config)
+        if circuit['state'] != CIRCUIT_CLOSED:
+            logger.error("Health check failed with the circuit breaker %s: %s" % (circuit, str(e)))
+            raise ConnectorError(str(e))
+        if not str(e).startswith(AUTH_ERROR_PREFIXES):
+            logger.error("Health check failed: %s" % str(e))
+            raise ConnectorError(str(e))
         logger.error("Invalid Credentials: %s" % str(e))
         raise ConnectorError("Invalid Credentials")
 
@@ -254,5 +2061,21 @@ operations = {
     'list_certificates': list_certificates,
     'create_policy': create_policy,
     'update_policy': update_policy,
-    'delete_user_from_policy': delete_user_from_policy
+    'delete_user_from_policy': delete_user_from_policy,
+    'add_members_to_policies': add_members_to_policies,
+    'remove_members_from_policies': remove_members_from_policies,
+    'get_tenant_inventory': get_tenant_inventory,
+    'sync_entities': sync_entities,
+    'get_connector_metrics': get_connector_metrics,
+    'ingest_records': ingest_records,
+    'get_effective_access': get_effective_access,
+    'who_can_access': who_can_access,
+    'query_all_consoles': query_all_consoles,
+    'offboard_users': offboard_users,
+    'export_policies': export_policies,
+    'import_policies': import_policies,
+    'process_change_events': process_change_events,
+    'get_active_policies': get_active_policies
 }
+
+reset_metrics()
@@ -0,0 +1,105 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import copy
+import json
+import logging
+import os
+import sys
+import threading
+import types
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import connectors.core.connector  # noqa: F401
+except ImportError:
+    # Outside FortiSOAR the SDK is not installed; the operations only need these three names from it.
+    class ConnectorError(Exception):
+        pass
+
+    sdk = types.ModuleType('connectors.core.connector')
+    sdk.Connector = object
+    sdk.ConnectorError = ConnectorError
+    sdk.get_logger = logging.getLogger
+    for name in ('connectors', 'connectors.core'):
+        sys.modules.setdefault(name, types.ModuleType(name))
+    sys.modules['connectors.core.connector'] = sdk
+
+from cyolo import operations  # noqa: E402
+from connectors.core.connector import ConnectorError  # noqa: E402
+
+
+def make_policy(policy_id, **fields):
+    policy = {
+        'id': policy_id, 'name': f"policy-{policy_id}", 'enabled': True,
+        'users': [], 'mappings': [], 'simple_groups': [], 'dynamic_groups': [], 'group_supervisors': [],
+        'supervisors': [], 'webhooks': [], 'mapping_categories': [], 'ip_sources': [], 'trusted_certificates': [],
+        'capabilities': [], 'constraints': [], 'device_posture_profile_ids': [],
+        'timed_access': {'enabled': False, 'start': '00:00', 'end': '00:00', 'days': [False] * 7}
+    }
+    policy.update(fields)
+    return policy
+
+
+class FakeConsole:
+    """Answers send_api_call for single policies and the records set in records (read or deleted), recording every request."""
+
+    def __init__(self):
+        self.policies = {}
+        self.records = {}
+        self.calls = []
+        self.lock = threading.Lock()
+        self.before_get = None
+        self.before_post = None
+        self.after_post = None
+        self.post_errors = []
+
+    def __call__(self, method="GET", endpoint="", config=None, params=None, data=None, json_data=None, stream=False):
+        with self.lock:
+            self.calls.append((method, endpoint))
+        if method in ('GET', 'DELETE') and endpoint in self.records:
+            record = self.records[endpoint]
+            if isinstance(record, Exception):
+                raise record
+            return copy.deepcopy(record)
+        parts = endpoint.split('/')
+        if parts[0] != 'policies' or len(parts) != 2 or parts[1] not in self.policies:
+            raise ConnectorError('Response [404:Not Found]')
+        if method == 'GET':
+            if self.before_get:
+                self.before_get()
+            return copy.deepcopy(self.policies[parts[1]])
+        if self.before_post:
+            self.before_post()
+        if self.post_errors:
+            raise ConnectorError(self.post_errors.pop(0))
+        payload = json.loads(data)
+        payload['device_posture_profile_ids'] = payload.pop('device_posture_profiles')
+        self.policies[parts[1]].update(payload)
+        if self.after_post:
+            self.after_post()
+        return copy.deepcopy(self.policies[parts[1]])
+
+    def count(self, method):
+        return len([x for x in self.calls if x[0] == method])
+
+
+@pytest.fixture
+def config():
+    # A distinct console per test keeps the per-configuration caches and queues of one test out of the others.
+    return {'server_url': f"https://{uuid.uuid4().hex}.example.cyolo.io", 'api_key': 'key', 'verify_ssl': False,
+            'policy_write_window': 0}
+
+
+@pytest.fixture
+def console(monkeypatch):
+    fake = FakeConsole()
+    monkeypatch.setattr(operations, 'send_api_call', fake)
+    return fake
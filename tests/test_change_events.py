@@ -0,0 +1,95 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import json
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import ConnectorError
+from cyolo import operations
+
+USERS = [{'id': 'u1', 'name': 'alice'}, {'id': 'u2', 'name': 'bob'}]
+
+
+@pytest.fixture
+def name_index(monkeypatch, config, console):
+    monkeypatch.setattr(operations, 'stream_records', lambda config, endpoint, params=None: iter(USERS))
+    operations.get_name_index(config, 'users')
+
+    def current():
+        return operations._name_index.get((operations.get_config_key(config), 'users'))
+    return current
+
+
+def test_updated_record_is_read_back_from_the_console(config, console, name_index):
+    console.records['users/u1'] = {'id': 'u1', 'name': 'alice.smith'}
+    # The event claims a name the console does not report; only the console's answer is indexed.
+    operations.apply_change_event(config, {'event': 'user.updated', 'id': 'u1', 'data': {'id': 'u1', 'name': 'bob'}})
+    index = name_index()
+    assert index['names'] == {'alice.smith': 'u1', 'bob': 'u2'}
+    assert not index['ambiguous']
+
+
+def test_unconfirmed_record_invalidates_the_index(config, console, name_index):
+    console.records['users/u3'] = ConnectorError('Response [500:Internal Server Error]')
+    operations.apply_change_event(config, {'event': 'user.created', 'id': 'u3', 'data': {'id': 'u3', 'name': 'alice'}})
+    assert name_index() is None
+
+
+def test_deleted_record_is_removed(config, console, name_index):
+    operations.apply_change_event(config, {'entity': 'user', 'action': 'deleted', 'id': 'u2'})
+    index = name_index()
+    assert index['ids'] == {'u1'} and index['names'] == {'alice': 'u1'}
+    assert console.calls == []
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def post(port, body, secret=None):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}", data=json.dumps(body).encode(), method='POST')
+    if secret:
+        request.add_header(operations.CHANGE_EVENT_SECRET_HEADER, secret)
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def test_receiver_requires_a_secret(config):
+    config['event_receiver_port'] = free_port()
+    assert operations.ensure_event_receiver(config) is None
+
+
+def test_receiver_rejects_events_without_the_secret(config, console, name_index):
+    config.update({'event_receiver_port': free_port(), 'event_receiver_secret': 's3cret'})
+    assert operations.ensure_event_receiver(config)
+    try:
+        with pytest.raises(urllib.error.HTTPError) as err:
+            post(config['event_receiver_port'], {'event': 'user.deleted', 'id': 'u1'}, 'wrong')
+        assert err.value.code == 401
+        assert post(config['event_receiver_port'], {'event': 'user.deleted', 'id': 'u1'}, 's3cret')['applied']
+        assert name_index()['ids'] == {'u2'}
+    finally:
+        operations.stop_event_receiver(config)
+
+
+def test_receiver_retries_after_the_port_is_freed(monkeypatch, config):
+    monkeypatch.setattr(operations, 'EVENT_RECEIVER_RETRY_INTERVAL', 0)
+    blocker = socket.socket()
+    blocker.bind(('127.0.0.1', 0))
+    blocker.listen()
+    config.update({'event_receiver_port': blocker.getsockname()[1], 'event_receiver_secret': 's3cret'})
+    assert operations.ensure_event_receiver(config) is None
+    blocker.close()
+    try:
+        assert operations.ensure_event_receiver(config)
+    finally:
+        operations.stop_event_receiver(config)
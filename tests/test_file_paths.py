@@ -0,0 +1,104 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import gzip
+import json
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+from conftest import ConnectorError, make_policy
+from cyolo import operations
+
+
+@pytest.fixture
+def temp_dir(monkeypatch, tmp_path):
+    directory = tmp_path / 'connector'
+    directory.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(directory))
+    return directory
+
+
+@pytest.mark.parametrize('name', ['policies.jsonl.gz', 'policies.jsonl.gz/../policies.jsonl.gz'])
+def test_names_resolve_inside_the_temporary_directory(temp_dir, name):
+    assert operations.get_temp_path(name, '.jsonl.gz') == os.path.realpath(temp_dir / 'policies.jsonl.gz')
+
+
+@pytest.mark.parametrize('name', ['../policies.jsonl.gz', '/etc/policies.jsonl.gz', 'sub/policies.jsonl.gz',
+                                  'policies.txt', '.', ''])
+def test_names_outside_the_temporary_directory_are_rejected(temp_dir, name):
+    with pytest.raises(ConnectorError, match='Invalid file name'):
+        operations.get_temp_path(name, '.jsonl.gz')
+
+
+def test_symlink_out_of_the_temporary_directory_is_rejected(temp_dir, tmp_path):
+    (temp_dir / 'link.jsonl.gz').symlink_to(tmp_path / 'outside.jsonl.gz')
+    with pytest.raises(ConnectorError, match='Invalid file name'):
+        operations.get_temp_path('link.jsonl.gz', '.jsonl.gz')
+
+
+def test_export_is_written_to_the_temporary_directory(monkeypatch, config, temp_dir):
+    monkeypatch.setattr(operations, 'stream_records', lambda config, endpoint, params=None: iter([make_policy('p1')]))
+    result = operations.export_policies(config, {})
+    assert os.path.dirname(result['file_path']) == os.path.realpath(temp_dir)
+    with gzip.open(result['file_path'], 'rt') as f:
+        lines = [json.loads(x) for x in f]
+    assert [x['type'] for x in lines] == ['header', 'policy'] and result['policies'] == 1
+    assert os.listdir(temp_dir) == [os.path.basename(result['file_path'])]
+
+
+def test_export_outside_the_temporary_directory_is_rejected(config, temp_dir, tmp_path):
+    with pytest.raises(ConnectorError, match='Invalid file name'):
+        operations.export_policies(config, {'file_path': str(tmp_path / 'policies.jsonl.gz')})
+    assert not (tmp_path / 'policies.jsonl.gz').exists()
+
+
+def test_import_outside_the_temporary_directory_is_rejected(config, temp_dir, tmp_path):
+    (tmp_path / 'policies.jsonl.gz').write_bytes(b'')
+    with pytest.raises(ConnectorError, match='Invalid file name'):
+        operations.import_policies(config, {'file_path': str(tmp_path / 'policies.jsonl.gz')})
+    with pytest.raises(ConnectorError, match='Export file not found'):
+        operations.import_policies(config, {'file_path': 'missing.jsonl.gz'})
+
+
+def test_snapshots_are_stored_in_the_temporary_directory(monkeypatch, config, temp_dir):
+    monkeypatch.setattr(operations, 'stream_records', lambda config, endpoint, params=None: iter([{'id': 'u1'}]))
+    assert operations.sync_entities(config, {'snapshot_path': 'snapshots.db'})['added'] == [{'id': 'u1'}]
+    assert operations.sync_entities(config, {'snapshot_path': 'snapshots.db'})['added'] == []
+    assert os.listdir(temp_dir) == ['snapshots.db']
+
+
+def test_snapshot_outside_the_temporary_directory_is_rejected(monkeypatch, config, temp_dir, tmp_path):
+    fetched = []
+    monkeypatch.setattr(operations, 'stream_records', lambda config, endpoint, params=None: fetched.append(endpoint))
+    with pytest.raises(ConnectorError, match='Invalid file name'):
+        operations.sync_entities(config, {'snapshot_path': str(tmp_path / 'snapshots.db')})
+    assert not fetched and not (tmp_path / 'snapshots.db').exists()
+
+
+def test_checkpoint_outside_the_temporary_directory_is_rejected(monkeypatch, config, temp_dir, tmp_path):
+    fetched = []
+    monkeypatch.setattr(operations, 'send_api_call', lambda *args, **kwargs: fetched.append(args) or [])
+    with pytest.raises(ConnectorError, match='Invalid file name'):
+        operations.ingest_records(config, {'entity': 'users', 'create_pb_id': 'pb',
+                                           'checkpoint_path': str(tmp_path / 'checkpoints.db')})
+    assert not fetched and not (tmp_path / 'checkpoints.db').exists()
+
+
+def test_checkpoint_is_stored_in_the_temporary_directory(monkeypatch, config, temp_dir):
+    crudhub = types.ModuleType('integrations.crudhub')
+    crudhub.trigger_ingest_playbook = lambda records, *args, **kwargs: None
+    monkeypatch.setitem(sys.modules, 'integrations', types.ModuleType('integrations'))
+    monkeypatch.setitem(sys.modules, 'integrations.crudhub', crudhub)
+    monkeypatch.setattr(operations, 'iter_ingestion_records',
+                        lambda config, entity, offset, page_size: iter([[{'id': 'u1'}], [{'id': 'u2'}]]))
+    result = operations.ingest_records(config, {'entity': 'users', 'create_pb_id': 'pb', 'batch_size': 1,
+                                                'checkpoint_path': 'checkpoints.db'})
+    assert result['ingested'] == 2
+    assert os.listdir(temp_dir) == ['checkpoints.db']
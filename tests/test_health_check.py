@@ -0,0 +1,34 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import logging
+
+import pytest
+
+from conftest import ConnectorError
+from cyolo import operations
+
+
+@pytest.mark.parametrize('error,circuit,expected,logged', [
+    ('Response [401:Unauthorized]', operations.CIRCUIT_CLOSED, 'Invalid Credentials', 'Invalid Credentials'),
+    ('Response [403:Forbidden]', operations.CIRCUIT_CLOSED, 'Invalid Credentials', 'Invalid Credentials'),
+    ('Response [500:Internal Server Error]', operations.CIRCUIT_CLOSED, 'Response [500', 'Health check failed'),
+    ('Circuit breaker is Open', operations.CIRCUIT_OPEN, 'Circuit breaker is Open',
+     'Health check failed with the circuit breaker'),
+])
+def test_health_check_failures(monkeypatch, caplog, config, console, error, circuit, expected, logged):
+    console.records[operations.HEALTH_CHECK_ENDPOINT] = ConnectorError(error)
+    monkeypatch.setattr(operations, 'get_circuit_status', lambda config: {'state': circuit, 'consecutive_failures': 5})
+    with caplog.at_level(logging.ERROR, logger='cyolo'):
+        with pytest.raises(ConnectorError, match=expected.replace('[', r'\[')):
+            operations._check_health(config)
+    assert caplog.records[-1].getMessage().startswith(logged)
+    assert ('Invalid Credentials' in caplog.text) == (expected == 'Invalid Credentials')
+
+
+def test_health_check_success(config, console):
+    console.records[operations.HEALTH_CHECK_ENDPOINT] = []
+    assert operations._check_health(config) is True
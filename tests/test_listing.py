@@ -0,0 +1,109 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import io
+from itertools import islice
+
+import pytest
+
+from conftest import ConnectorError
+from cyolo import operations
+
+
+def serve(monkeypatch, size, honours_paging):
+    records = [{'id': str(i)} for i in range(size)]
+    requests = []
+
+    def stream_records(config, endpoint, params=None):
+        requests.append(dict(params or {}))
+        if honours_paging and params:
+            yield from records[params['offset']:params['offset'] + params['limit']]
+        else:
+            yield from records
+
+    monkeypatch.setattr(operations, 'stream_records', stream_records)
+    return requests
+
+
+def ids(config, page_size, offset, limit=20):
+    return [x['id'] for x in islice(operations.iter_records(config, 'users', page_size, offset), limit)]
+
+
+@pytest.mark.parametrize('honours_paging', [True, False])
+@pytest.mark.parametrize('size,page_size,offset', [(3, 3, 0), (5, 100, 2), (10, 3, 0), (10, 3, 4), (10, 5, 10), (0, 3, 0),
+                                                   (3, 3, 1), (6, 3, 3), (9, 3, 3), (4, 3, 2), (3, 3, 3)])
+def test_iter_records(monkeypatch, config, honours_paging, size, page_size, offset):
+    serve(monkeypatch, size, honours_paging)
+    assert ids(config, page_size, offset) == [str(x) for x in range(offset, size)]
+
+
+def test_collection_of_exactly_one_page_is_not_repeated(monkeypatch, config):
+    requests = serve(monkeypatch, 3, honours_paging=False)
+    assert ids(config, 3, 0) == ['0', '1', '2']
+    assert len(requests) == 2
+
+
+def test_honoured_paging_reads_each_page_once(monkeypatch, config):
+    requests = serve(monkeypatch, 7, honours_paging=True)
+    assert ids(config, 3, 0) == [str(x) for x in range(7)]
+    assert [x['offset'] for x in requests] == [0, 3, 6]
+
+
+def test_offset_on_an_honoured_full_page_is_not_probed(monkeypatch, config):
+    requests = serve(monkeypatch, 10, honours_paging=True)
+    assert ids(config, 3, 4) == [str(x) for x in range(4, 10)]
+    assert [x['offset'] for x in requests] == [4, 7, 10]
+
+
+def test_offset_on_a_short_page_is_probed(monkeypatch, config):
+    requests = serve(monkeypatch, 5, honours_paging=True)
+    assert ids(config, 3, 3) == ['3', '4']
+    assert requests == [{'limit': 3, 'offset': 3}, {'limit': 1, 'offset': 0}]
+
+
+@pytest.mark.parametrize('max_records,expected', [(0, 0), ('0', 0), (2, 2), (None, 5), ('', 5)])
+def test_list_records_max_records(monkeypatch, config, max_records, expected):
+    requests = serve(monkeypatch, 5, honours_paging=True)
+    monkeypatch.setattr(operations, 'make_api_call', lambda **kwargs: [{'id': str(i)} for i in range(5)])
+    assert len(operations.list_records(config, 'users', {'max_records': max_records})) == expected
+    if max_records in (0, '0'):
+        assert requests == []
+
+
+class StreamedResponse:
+    def __init__(self, body):
+        self.content = body
+        self.raw = io.BytesIO(body)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+@pytest.mark.parametrize('body,expected', [(b'[{"id": "1", "score": 0.5}, {"id": "2"}]', [{'id': '1', 'score': 0.5}, {'id': '2'}]),
+                                           (b'[]', [])])
+def test_stream_records(monkeypatch, config, incremental, body, expected):
+    if incremental and not operations.ijson:
+        pytest.skip('ijson is not installed')
+    if not incremental:
+        monkeypatch.setattr(operations, 'ijson', None)
+    response = StreamedResponse(body)
+    monkeypatch.setattr(operations, 'make_api_call', lambda **kwargs: response)
+    assert list(operations.stream_records(config, 'users')) == expected
+    assert response.closed
+
+
+@pytest.mark.parametrize('incremental', [True, False])
+@pytest.mark.parametrize('body', [b'{"data": [{"id": "1"}]}', b'{"error": "internal"}'])
+def test_stream_records_rejects_non_array(monkeypatch, config, incremental, body):
+    if incremental and not operations.ijson:
+        pytest.skip('ijson is not installed')
+    if not incremental:
+        monkeypatch.setattr(operations, 'ijson', None)
+    monkeypatch.setattr(operations, 'make_api_call', lambda **kwargs: StreamedResponse(body))
+    with pytest.raises(ConnectorError, match='Unexpected response'):
+        list(operations.stream_records(config, 'users'))
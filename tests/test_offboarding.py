@@ -0,0 +1,83 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import pytest
+
+from conftest import ConnectorError, make_policy
+from cyolo import operations
+
+USERS = [{'id': 'u1', 'name': 'alice'}, {'id': 'u2', 'name': 'bob'}, {'id': 'u3', 'name': 'carol'},
+         {'id': 'u4', 'name': 'carol'}, {'id': 'u5', 'name': 'dave'}]
+
+
+@pytest.fixture
+def tenant(monkeypatch, config, console):
+    console.policies.update({
+        'p1': make_policy('p1', users=['u1', 'u2', 'u5'], supervisors=['u1']),
+        'p2': make_policy('p2', users=['u1', 'u3']),
+        'p3': make_policy('p3', users=['u5'])
+    })
+    for user in USERS:
+        console.records[f"users/{user['id']}"] = {}
+
+    def stream_records(config, endpoint, params=None):
+        return iter(USERS if endpoint == 'users' else list(console.policies.values()))
+    monkeypatch.setattr(operations, 'stream_records', stream_records)
+    return console
+
+
+def deleted(console):
+    return sorted(x[1] for x in console.calls if x[0] == 'DELETE')
+
+
+def by_user(result):
+    return {x['user']: x for x in result['results']}
+
+
+def test_users_are_resolved_by_id_and_name(config, tenant):
+    result = operations.offboard_users(config, {'users': 'u1, Bob, carol, nobody, u1'})
+    results = by_user(result)
+    assert list(results) == ['u1', 'Bob', 'carol', 'nobody']
+    assert results['u1'] == {'user': 'u1', 'id': 'u1', 'status': 'success', 'policies': ['p1', 'p2'], 'deleted': True}
+    assert results['Bob'] == {'user': 'Bob', 'id': 'u2', 'status': 'success', 'policies': ['p1'], 'deleted': True}
+    assert results['carol']['status'] == 'failed' and 'Multiple users' in results['carol']['error']
+    assert results['nobody']['status'] == 'not found' and not results['nobody']['deleted']
+    assert (result['status'], result['succeeded'], result['failed'], result['not_found']) == ('partial success', 2, 1, 1)
+    # Neither user holding the ambiguous name is touched.
+    assert tenant.policies['p1']['users'] == ['u5'] and tenant.policies['p1']['supervisors'] == []
+    assert tenant.policies['p2']['users'] == ['u3']
+    assert deleted(tenant) == ['users/u1', 'users/u2']
+
+
+def test_user_is_kept_when_a_policy_rewrite_fails(config, tenant):
+    tenant.records['policies/p2'] = ConnectorError('Response [500:Internal Server Error]')
+    result = operations.offboard_users(config, {'users': ['alice', 'bob']})
+    results = by_user(result)
+    assert results['alice']['status'] == 'failed' and not results['alice']['deleted']
+    assert 'policy p2' in results['alice']['error']
+    assert results['bob']['status'] == 'success' and results['bob']['deleted']
+    assert result['status'] == 'partial success' and result['policies_affected'] == 2
+    assert deleted(tenant) == ['users/u2']
+
+
+def test_failed_delete_is_reported(config, tenant):
+    tenant.records['users/u5'] = ConnectorError('Response [500:Internal Server Error]')
+    results = by_user(operations.offboard_users(config, {'users': ['dave']}))
+    assert results['dave']['status'] == 'failed' and not results['dave']['deleted']
+    assert results['dave']['policies'] == ['p1', 'p3']
+
+
+def test_users_are_only_removed_from_policies_without_delete_users(config, tenant):
+    result = operations.offboard_users(config, {'users': ['alice', 'dave'], 'delete_users': False})
+    assert result['status'] == 'success' and result['policies_affected'] == 3
+    assert not any(x['deleted'] for x in result['results'])
+    assert deleted(tenant) == []
+    assert [tenant.policies[x]['users'] for x in ('p1', 'p2', 'p3')] == [['u2'], ['u3'], []]
+
+
+def test_users_are_required(config, tenant):
+    with pytest.raises(ConnectorError, match='At least one user'):
+        operations.offboard_users(config, {'users': ' , '})
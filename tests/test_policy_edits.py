@@ -0,0 +1,35 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+from conftest import make_policy
+from cyolo import operations
+
+CONSTRAINTS = [{'constraint_id': '2', 'value': True}, {'constraint_id': '3', 'value': '1'}]
+
+
+def test_merge_ids_keeps_order_and_drops_duplicates():
+    assert operations.merge_ids(['a', 'b'], ['b', 'c', 'c']) == ['a', 'b', 'c']
+
+
+def test_merge_and_remove_accept_dicts():
+    merged = operations.merge_ids(CONSTRAINTS, [{'value': True, 'constraint_id': '2'}, {'constraint_id': '4', 'value': 5}])
+    assert merged == CONSTRAINTS + [{'constraint_id': '4', 'value': 5}]
+    assert operations.remove_ids(merged, [CONSTRAINTS[0]]) == merged[1:]
+
+
+def test_rename_policy_with_constraints(config, console):
+    console.policies['p1'] = make_policy('p1', constraints=list(CONSTRAINTS),
+                                         capabilities=[{'capability_id': '11', 'value': True}])
+    result = operations.update_policy(config, {'id': 'p1', 'name': 'renamed'})
+    assert result['changed'] and list(result['changes']) == ['name']
+    assert console.policies['p1']['name'] == 'renamed'
+    assert console.policies['p1']['constraints'] == CONSTRAINTS
+
+
+def test_update_policy_merges_constraints(config, console):
+    console.policies['p1'] = make_policy('p1', constraints=list(CONSTRAINTS))
+    operations.update_policy(config, {'id': 'p1', 'constraints': [CONSTRAINTS[1], {'constraint_id': '4', 'value': 5}]})
+    assert console.policies['p1']['constraints'] == CONSTRAINTS + [{'constraint_id': '4', 'value': 5}]
@@ -0,0 +1,127 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import threading
+import time
+
+import pytest
+
+from conftest import ConnectorError, make_policy
+from cyolo import operations
+
+
+def add_user(user_id):
+    def edit(original_policy, updated_policy_payload):
+        updated_policy_payload['users'] = operations.merge_ids(updated_policy_payload['users'], [user_id])
+    return edit
+
+
+def failing_edit(original_policy, updated_policy_payload):
+    raise ValueError('bad edit')
+
+
+def submit_concurrently(config, console, edits):
+    """Hold the first write until every other edit has been queued behind it, then release it."""
+    release, first_post = threading.Event(), threading.Event()
+
+    def before_post():
+        if not first_post.is_set():
+            first_post.set()
+            release.wait(5)
+
+    console.before_post = before_post
+    results = [None] * len(edits)
+
+    def submit(i):
+        try:
+            results[i] = operations.submit_policy_edit(config, 'p1', edits[i])
+        except Exception as err:
+            results[i] = err
+
+    threads = [threading.Thread(target=submit, args=(0,))]
+    threads[0].start()
+    first_post.wait(5)
+    threads += [threading.Thread(target=submit, args=(i,)) for i in range(1, len(edits))]
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_idle_policy_is_written_without_waiting(config, console):
+    config['policy_write_window'] = 500
+    console.policies['p1'] = make_policy('p1')
+    start = time.perf_counter()
+    changes = operations.submit_policy_edit(config, 'p1', add_user('u1'))
+    assert time.perf_counter() - start < 0.25
+    assert changes == {'users': {'added': ['u1'], 'removed': []}}
+
+
+def test_edits_queued_behind_a_write_are_coalesced(config, console):
+    console.policies['p1'] = make_policy('p1')
+    results = submit_concurrently(config, console, [add_user(f"u{i}") for i in range(6)])
+    assert not any(isinstance(x, Exception) for x in results)
+    # The first edit is written alone, the five queued behind it with one write, each read before and after.
+    assert console.count('GET') == 4 and console.count('POST') == 2
+    assert sorted(console.policies['p1']['users']) == [f"u{i}" for i in range(6)]
+
+
+def test_failing_edit_fails_alone(config, console):
+    console.policies['p1'] = make_policy('p1')
+    results = submit_concurrently(config, console, [add_user('u0'), add_user('u1'), failing_edit, add_user('u2')])
+    assert isinstance(results[2], ValueError)
+    assert not any(isinstance(x, Exception) for i, x in enumerate(results) if i != 2)
+    assert sorted(console.policies['p1']['users']) == ['u0', 'u1', 'u2']
+
+
+def test_noop_edit_is_not_written(config, console):
+    console.policies['p1'] = make_policy('p1', users=['u1'])
+    assert operations.submit_policy_edit(config, 'p1', add_user('u1')) == {}
+    assert console.count('POST') == 0
+
+
+def test_write_undone_by_another_worker_is_retried(config, console):
+    console.policies['p1'] = make_policy('p1', users=['u1'])
+
+    def stale_write():
+        # Another worker writes the copy of the policy it read before ours landed.
+        console.policies['p1']['users'] = ['u1', 'u2']
+        console.after_post = None
+
+    console.after_post = stale_write
+    changes = operations.submit_policy_edit(config, 'p1', add_user('u3'))
+    assert changes == {'users': {'added': ['u3'], 'removed': []}}
+    assert console.count('POST') == 2 and console.count('GET') == 4
+    assert console.policies['p1']['users'] == ['u1', 'u2', 'u3']
+
+
+def test_write_is_not_repeated_when_it_landed(config, console):
+    console.policies['p1'] = make_policy('p1', users=['u1'])
+    operations.submit_policy_edit(config, 'p1', add_user('u2'))
+    assert console.count('POST') == 1 and console.count('GET') == 2
+
+
+def test_writes_undone_every_time_give_up_after_the_retry_limit(config, console):
+    console.policies['p1'] = make_policy('p1')
+
+    def stale_write():
+        console.policies['p1']['users'] = []
+
+    console.after_post = stale_write
+    with pytest.raises(ConnectorError, match='kept changing'):
+        operations.submit_policy_edit(config, 'p1', add_user('u1'))
+    assert console.count('POST') == operations.POLICY_WRITE_RETRIES + 1
+
+
+def test_failed_write_is_not_retried(config, console):
+    console.policies['p1'] = make_policy('p1')
+    console.post_errors = ['Response [409:Conflict]']
+    with pytest.raises(ConnectorError, match='409'):
+        operations.submit_policy_edit(config, 'p1', add_user('u1'))
+    assert console.count('GET') == 1
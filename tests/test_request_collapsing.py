@@ -0,0 +1,57 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import threading
+import time
+
+from conftest import make_policy
+from cyolo import operations
+
+
+def start_blocked_read(config, console):
+    release, started = threading.Event(), threading.Event()
+
+    def before_get():
+        started.set()
+        release.wait(5)
+
+    console.before_get = before_get
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(
+        operations.make_api_call(endpoint='policies/p1', config=config))) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    started.wait(5)
+    time.sleep(0.05)
+    console.before_get = None
+    return release, readers, results
+
+
+def test_concurrent_identical_reads_share_one_request(config, console):
+    console.policies['p1'] = make_policy('p1')
+    release, readers, results = start_blocked_read(config, console)
+    release.set()
+    for reader in readers:
+        reader.join()
+    assert console.count('GET') == 1
+    assert len(results) == 3 and results[0] == results[1] == results[2]
+    results[0]['name'] = 'changed'
+    assert results[1]['name'] == 'policy-p1'
+
+
+def test_policy_edit_does_not_join_a_read_in_flight(config, console):
+    console.policies['p1'] = make_policy('p1')
+    release, readers, results = start_blocked_read(config, console)
+    try:
+        result = operations.update_policy(config, {'id': 'p1', 'name': 'renamed'})
+    finally:
+        release.set()
+        for reader in readers:
+            reader.join()
+    assert result['changed']
+    # The blocked read, then the edit's own read and its read back after the write.
+    assert console.count('GET') == 3
+    assert console.policies['p1']['name'] == 'renamed'
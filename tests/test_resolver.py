@@ -0,0 +1,61 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import pytest
+
+from conftest import ConnectorError
+from cyolo import operations
+
+ALICE = '0b6e3a4c-2f1d-4c5e-9a7b-1c2d3e4f5a6b'
+BOB = '7d8e9f0a-1b2c-4d3e-8f4a-5b6c7d8e9f0a'
+UNKNOWN = 'ffffffff-1b2c-4d3e-8f4a-5b6c7d8e9f0a'
+
+
+@pytest.fixture
+def loads(monkeypatch, config):
+    users = [{'id': ALICE, 'name': 'alice', 'email': 'alice@example.com'}, {'id': BOB, 'name': 'bob'},
+             {'id': 'u3', 'name': 'carol'}, {'id': 'u4', 'name': 'carol'}]
+    loaded = []
+
+    def stream_records(config, endpoint, params=None):
+        loaded.append(endpoint)
+        return iter(users)
+    monkeypatch.setattr(operations, 'stream_records', stream_records)
+    return loaded
+
+
+def test_ids_are_not_looked_up(config, loads):
+    assert operations.resolve_ids(config, 'users', [ALICE, UNKNOWN.upper()]) == [ALICE, UNKNOWN.upper()]
+    assert loads == []
+
+
+def test_names_are_resolved(config, loads):
+    assert operations.resolve_ids(config, 'users', ['Alice', 'alice@example.com', BOB, 'u3']) == [ALICE, ALICE, BOB, 'u3']
+    assert loads == ['users']
+
+
+def test_ambiguous_name_is_rejected(config, loads):
+    with pytest.raises(ConnectorError, match="Multiple users match the name 'carol'"):
+        operations.resolve_ids(config, 'users', ['carol'])
+
+
+def test_unknown_names_refresh_the_index_at_most_once_per_interval(monkeypatch, config, loads):
+    for _ in range(5):
+        assert operations.resolve_ids(config, 'users', ['dave', 'alice']) == ['dave', ALICE]
+    # The index was just loaded, so the unknown name does not reload it.
+    assert loads == ['users']
+    monkeypatch.setattr(operations, 'RESOLVER_REFRESH_INTERVAL', 0)
+    operations.resolve_ids(config, 'users', ['dave'])
+    assert loads == ['users', 'users']
+
+
+@pytest.mark.parametrize('user', [BOB, 'Bob'])
+def test_deleted_user_is_no_longer_resolved(monkeypatch, config, loads, user):
+    monkeypatch.setattr(operations, 'make_api_call', lambda **kwargs: {})
+    assert operations.resolve_ids(config, 'users', ['bob']) == [BOB]
+    operations.delete_user_by_id_or_name(config, {'id': user})
+    assert operations.resolve_ids(config, 'users', ['bob']) == ['bob']
+    assert loads == ['users']
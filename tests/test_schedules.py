@@ -0,0 +1,66 @@
+""" Copyright start
+  Copyright (C) 2008 - 2023 Fortinet Inc.
+  All rights reserved.
+  FORTINET CONFIDENTIAL & FORTINET PROPRIETARY SOURCE CODE
+  Copyright end """
+
+import random
+
+import pytest
+
+from cyolo import operations
+from cyolo.operations import MINUTES_PER_DAY, MINUTES_PER_WEEK
+
+
+def naive_week(key):
+    """Mark every minute of the week covered by an allowed day's window, without compiling the schedule."""
+    mask, start, end = key
+    length = (end - start) % MINUTES_PER_DAY or MINUTES_PER_DAY
+    week = bytearray(MINUTES_PER_WEEK)
+    for day in range(7):
+        if mask >> day & 1:
+            for minute in range(day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + start + length):
+                week[minute % MINUTES_PER_WEEK] = 1
+    return bytes(week)
+
+
+def naive_next_change(week, minute):
+    position = (week + week).find(1 - week[minute], minute + 1)
+    return None if position == -1 else position - minute
+
+
+def random_keys(count, seed=1):
+    rng = random.Random(seed)
+    for _ in range(count):
+        # Mix edge starts and ends (midnight, end of day, equal) with random ones.
+        yield (rng.randrange(128), rng.choice([0, 30, 480, 1380, rng.randrange(MINUTES_PER_DAY)]),
+               rng.choice([0, 30, 1020, rng.randrange(MINUTES_PER_DAY)]))
+
+
+@pytest.mark.parametrize('key', list(random_keys(300)))
+def test_compiled_schedule_matches_naive_evaluation(key):
+    boundaries = operations.compile_schedule(key)
+    week = naive_week(key)
+    rng = random.Random(str(key))
+    minutes = [rng.randrange(MINUTES_PER_WEEK) for _ in range(40)]
+    # Also probe either side of every boundary and the wrap of the week.
+    minutes += [(x + d) % MINUTES_PER_WEEK for x in boundaries for d in (-1, 0)] + [0, MINUTES_PER_WEEK - 1]
+    for minute in minutes:
+        assert operations.schedule_active(boundaries, minute) == bool(week[minute]), minute
+        assert operations.schedule_next_change(boundaries, minute) == naive_next_change(week, minute), minute
+
+
+@pytest.mark.parametrize('timed_access, expected', [
+    (None, None),
+    ({'enabled': False, 'start': '08:00', 'end': '17:00', 'days': [True] * 7}, None),
+    ({'enabled': True, 'start': '08:00', 'end': '17:30', 'days': [True, False, True]}, (0b101, 480, 1050)),
+    ({'enabled': True, 'start': 'bogus', 'end': '24:00', 'days': []}, (0, 0, 0)),
+])
+def test_schedule_key(timed_access, expected):
+    assert operations.schedule_key(timed_access) == expected
+
+
+def test_all_day_every_day_never_changes():
+    boundaries = operations.compile_schedule((0b1111111, 0, 0))
+    assert operations.schedule_active(boundaries, 1234)
+    assert operations.schedule_next_change(boundaries, 1234) is None